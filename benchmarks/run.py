@@ -0,0 +1,301 @@
+"""
+Benchmarks de los pipelines ASFI y SOAT sobre boletines sintéticos.
+
+Corre process_pdf_to_long_format y la exportación tal como en producción y
+resume sus métricas por etapa (título, fecha, tabla, aplanado y exportación,
+con subetapas como la apertura o la extracción de palabras). Guarda los
+tiempos en JSON para poder comparar corridas entre versiones de pdfplumber /
+PyMuPDF o cambios de heurística.
+
+Ejemplos:
+    python benchmarks/run.py --pipeline asfi --pages 5 --rows 60 --groups 7
+    python benchmarks/run.py --pipeline soat --departments 9 --vehicles 30 --repeat 3
+    python benchmarks/run.py --pipeline soat --vehicles 30 --table-backend pymupdf --parity
+    python benchmarks/run.py --compare benchmarks/results/antes.json benchmarks/results/despues.json
+    python benchmarks/run.py --pipeline asfi --stream --pages 200 --max-rss-mb 400
+"""
+from pathlib import Path
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+import fitz
+import pandas as pd
+import pdfplumber
+
+from benchmarks.synthetic import make_asfi_pdf, make_soat_pdf
+from common.cache import CACHE_DIR_ENV
+from common.export import OUTPUT_FORMATS, LongTableWriter, write_long_table
+from common.metrics import collect_records, stage
+from common.snapshot import SNAPSHOT_DIR_ENV
+import build_table.asfi
+import build_table.soat
+from extract_table.asfi import extract_asfi_table, WORD_BACKENDS
+from extract_table.soat import extract_table_from_pdf, TABLE_BACKENDS
+
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+
+# ------------------------------------------------------------
+# PIPELINES (los puntos de entrada reales, medidos con sus métricas por etapa)
+# ------------------------------------------------------------
+def stage_seconds(records: list[dict]) -> tuple[dict, dict]:
+    """
+    Segundos por etapa de primer nivel (suman el total de la página) y por
+    subetapa anidada, p.ej. "table/words" o "title/open".
+    """
+    stages, substages = {}, {}
+    for record in records:
+        seconds = record["duration_ms"] / 1000
+        if "parent" in record:
+            name = f"{record['parent']}/{record['stage']}"
+            substages[name] = substages.get(name, 0.0) + seconds
+        else:
+            stages[record["stage"]] = stages.get(record["stage"], 0.0) + seconds
+    return stages, substages
+
+
+def run_page(pipeline: str, pdf_path: Path, page_number: int, out_base: Path, output_format: str,
+             options: dict) -> dict:
+    """Una página con ``process_pdf_to_long_format`` y la exportación, como en producción."""
+    module = build_table.asfi if pipeline == "asfi" else build_table.soat
+    with collect_records() as records:
+        df_final = module.process_pdf_to_long_format(pdf_path, page_number, **options)
+        with stage("export", format=output_format):
+            write_long_table(df_final, out_base, output_format)
+    stages, substages = stage_seconds(records)
+    table = next((r for r in records if r["stage"] == "table" and "parent" not in r), {})
+    return {"stages": stages, "substages": substages, "rows": len(df_final),
+            "raw_rows": table.get("rows"), "raw_cols": table.get("cols")}
+
+
+# ------------------------------------------------------------
+# MEMORIA EN MODO STREAMING
+# ------------------------------------------------------------
+def current_rss_mb() -> float:
+    """RSS actual (Linux); en otros sistemas, el pico informado por getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def run_stream(pdf_path: Path, pipeline: str, pages: int, out_base: Path, output_format: str) -> dict:
+    """Recorre todas las páginas con iter_long_format y mide el RSS después de cada una."""
+    module = build_table.asfi if pipeline == "asfi" else build_table.soat
+    rss = [current_rss_mb()]
+    start = time.perf_counter()
+    with LongTableWriter(out_base, output_format, module.LONG_COLUMNS) as writer:
+        for chunk in module.iter_long_format(pdf_path, range(1, pages + 1)):
+            writer.write(chunk)
+            rss.append(current_rss_mb())
+    return {
+        "seconds": time.perf_counter() - start,
+        "rows": writer.rows,
+        "rss_start_mb": rss[0],
+        "rss_peak_mb": max(rss),
+        # crecimiento entre el primer 10% de páginas y el final: ~0 si la memoria está acotada
+        "rss_growth_mb": rss[-1] - rss[max(1, len(rss) // 10)],
+        "rss_mb": rss,
+    }
+
+
+# ------------------------------------------------------------
+# PARIDAD DE MOTORES (palabras ASFI / grilla SOAT)
+# ------------------------------------------------------------
+def check_word_backend_parity(pdf_path: Path, page_number: int) -> bool:
+    """True si pdfplumber y PyMuPDF producen el mismo DataFrame ASFI."""
+    frames = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for backend in WORD_BACKENDS:
+            frames.append(extract_asfi_table(Path(pdf_path), page_number, word_backend=backend))
+    try:
+        pd.testing.assert_frame_equal(frames[0], frames[1])
+    except AssertionError as e:
+        print(f"❌ Diferencias entre motores en {Path(pdf_path).name} p{page_number}:\n{e}")
+        return False
+    return True
+
+
+def check_table_backend_parity(pdf_path: Path, page_number: int) -> bool:
+    """True si pdfplumber y PyMuPDF (find_tables) producen la misma grilla SOAT."""
+    frames = [extract_table_from_pdf(str(pdf_path), page_number, table_backend=backend)
+              for backend in TABLE_BACKENDS]
+    try:
+        pd.testing.assert_frame_equal(frames[0], frames[1])
+    except AssertionError as e:
+        print(f"❌ Diferencias entre motores de tabla en {Path(pdf_path).name} p{page_number}:\n{e}")
+        return False
+    return True
+
+
+# ------------------------------------------------------------
+# RESUMEN Y COMPARACIÓN
+# ------------------------------------------------------------
+def summarize(samples: list[dict], key: str = "stages") -> dict:
+    """Mediana, mínimo y máximo por etapa (``key="substages"``: por subetapa, sin total)."""
+    stages = list(dict.fromkeys(s for sample in samples for s in sample[key]))  # orden del pipeline
+    summary = {}
+    for name in stages + (["total"] if key == "stages" else []):
+        values = [sum(x[key].values()) if name == "total" else x[key].get(name, 0.0)
+                  for x in samples]
+        summary[name] = {
+            "median": statistics.median(values),
+            "min": min(values),
+            "max": max(values),
+        }
+    return summary
+
+
+def print_summary(summary: dict, title: str) -> None:
+    print(f"\n⏱️ {title}")
+    for name, stats in summary.items():
+        print(f"   {name:<12} mediana {stats['median'] * 1000:9.2f} ms   "
+              f"(min {stats['min'] * 1000:.2f} / max {stats['max'] * 1000:.2f})")
+
+
+def compare(before_file: Path, after_file: Path) -> None:
+    before = json.loads(Path(before_file).read_text(encoding="utf-8"))
+    after = json.loads(Path(after_file).read_text(encoding="utf-8"))
+    print(f"📊 {Path(before_file).name} → {Path(after_file).name}")
+    for name, stats in after["summary"].items():
+        old = before["summary"].get(name)
+        if not old:
+            continue
+        change = (stats["median"] / old["median"] - 1) * 100 if old["median"] else 0.0
+        print(f"   {name:<8} {old['median'] * 1000:9.2f} ms → {stats['median'] * 1000:9.2f} ms  ({change:+.1f}%)")
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks por etapa de los pipelines ASFI / SOAT")
+    parser.add_argument("--pipeline", choices=["asfi", "soat"], default="asfi")
+    parser.add_argument("--pages", type=int, default=3, help="Páginas del PDF sintético")
+    parser.add_argument("--rows", type=int, default=40, help="ASFI: filas de datos por página")
+    parser.add_argument("--groups", type=int, default=1, help="ASFI: grupos MN+UFV/ME+MV/TOTAL")
+    parser.add_argument("--departments", type=int, default=9, help="SOAT: departamentos por página")
+    parser.add_argument("--vehicles", type=int, default=13, help="SOAT: columnas de vehículo")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por página")
+    parser.add_argument("--word-backend", choices=list(WORD_BACKENDS), default="pdfplumber")
+    parser.add_argument("--table-backend", choices=list(TABLE_BACKENDS), default="pdfplumber",
+                        help="SOAT: motor de detección de la grilla")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), default="excel")
+    parser.add_argument("--parity", action="store_true",
+                        help="Verificar que pdfplumber y PyMuPDF den la misma tabla "
+                             "(ASFI: motores de palabras; SOAT: motores de grilla)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Medir memoria recorriendo todas las páginas en una pasada (iter_long_format)")
+    parser.add_argument("--max-rss-mb", type=float,
+                        help="Con --stream: falla (código 1) si el pico de RSS supera este valor")
+    parser.add_argument("--output", type=Path, help="Archivo JSON de resultados")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("ANTES", "DESPUES"),
+                        help="Comparar dos archivos de resultados y salir")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    # medir siempre la extracción real, sin caché ni instantáneas
+    os.environ.pop(CACHE_DIR_ENV, None)
+    os.environ.pop(SNAPSHOT_DIR_ENV, None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if args.pipeline == "asfi":
+            pdf_path = make_asfi_pdf(tmp / "2025-04-30_asfi_bench.pdf", pages=args.pages,
+                                     rows=args.rows, groups=args.groups)
+        else:
+            pdf_path = make_soat_pdf(tmp / "2025-06-30_soat_bench.pdf", pages=args.pages,
+                                     departments=args.departments, vehicles=args.vehicles)
+
+        if args.stream:
+            return main_stream(args, pdf_path, tmp)
+
+        options = ({"word_backend": args.word_backend} if args.pipeline == "asfi"
+                   else {"table_backend": args.table_backend})
+        samples = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.repeat):
+                for page_number in range(1, args.pages + 1):
+                    sample = run_page(args.pipeline, pdf_path, page_number, tmp / f"out_p{page_number}",
+                                      args.output_format, options)
+                    sample["page"] = page_number
+                    samples.append(sample)
+
+        parity = None
+        if args.parity and args.pipeline == "asfi":
+            parity = all(check_word_backend_parity(pdf_path, p) for p in range(1, args.pages + 1))
+            print("✅ Motores de palabras equivalentes" if parity else "❌ Los motores de palabras difieren")
+        elif args.parity:
+            parity = all(check_table_backend_parity(pdf_path, p) for p in range(1, args.pages + 1))
+            print("✅ Motores de tabla equivalentes" if parity else "❌ Los motores de tabla difieren")
+
+    summary = summarize(samples)
+    print_summary(summary, f"{args.pipeline.upper()} — {args.pages} páginas × {args.repeat} repeticiones")
+    substages = summarize(samples, "substages")
+    print_summary(substages, "Subetapas (incluidas en su etapa)")
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "versions": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "pdfplumber": pdfplumber.__version__,
+            "pymupdf": fitz.VersionBind,
+        },
+        "parity": parity,
+        "summary": summary,
+        "substages": substages,
+        "samples": samples,
+    }
+    output = args.output or RESULTS_DIR / f"{args.pipeline}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n💾 Resultados en: {output}")
+    return 0 if parity is not False else 1
+
+
+def main_stream(args: argparse.Namespace, pdf_path: Path, tmp: Path) -> int:
+    result = run_stream(pdf_path, args.pipeline, args.pages, tmp / "stream", args.output_format)
+    print(f"\n🧠 {args.pipeline.upper()} streaming — {args.pages} páginas, {result['rows']} filas "
+          f"en {result['seconds']:.1f}s")
+    print(f"   RSS inicial {result['rss_start_mb']:.1f} MB · pico {result['rss_peak_mb']:.1f} MB · "
+          f"crecimiento {result['rss_growth_mb']:+.1f} MB")
+
+    output = args.output or RESULTS_DIR / f"{args.pipeline}_stream_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "stream": result,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n💾 Resultados en: {output}")
+
+    if args.max_rss_mb is not None and result["rss_peak_mb"] > args.max_rss_mb:
+        print(f"❌ Pico de RSS {result['rss_peak_mb']:.1f} MB supera el límite de {args.max_rss_mb:.0f} MB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
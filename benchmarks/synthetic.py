@@ -0,0 +1,118 @@
+"""
+Generadores de boletines sintéticos con PyMuPDF para los benchmarks.
+
+- ASFI: páginas tipo "carta informativa" con grupos de columnas
+  MN+UFV / ME+MV / TOTAL, secciones en mayúsculas y números en formato boliviano.
+- SOAT: grillas con reglas, departamentos por fila (servicio particular,
+  público y total) y clases de vehículo por columna, con MOTOCICLETA y
+  TOTAL GENERAL.
+"""
+from pathlib import Path
+import random
+
+import fitz
+
+ASFI_SECTIONS = ["DISPONIBILIDADES", "INVERSIONES TEMPORARIAS", "PREVISION", "TOTAL (A+B)"]
+SOAT_DEPARTMENTS = ["CHUQUISACA", "LA PAZ", "COCHABAMBA", "ORURO", "POTOSI",
+                    "TARIJA", "SANTA CRUZ", "BENI", "PANDO"]
+SOAT_VEHICLES = ["AUTOMOVIL", "CAMIONETA", "VAGONETA", "JEEP", "MICROBUS", "MINIBUS", "OMNIBUS",
+                 "CAMION", "TRACTO CAMION", "FURGON", "MOTOCICLETA", "MOTOTAXI", "CUADRATRACK"]
+
+
+def _bolivian(value: float) -> str:
+    text = f"{abs(value):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"({text})" if value < 0 else text
+
+
+def make_asfi_pdf(path, pages: int = 1, rows: int = 40, groups: int = 1, seed: int = 0) -> Path:
+    """
+    Crea un PDF ASFI sintético. ``groups`` repite el trío MN+UFV / ME+MV / TOTAL
+    (la carta informativa real tiene varios grupos por entidad).
+    """
+    rnd = random.Random(seed)
+    col_width = 70
+    width = 260 + groups * 3 * col_width
+    line_height = 11
+    height = max(792, 140 + (rows + rows // 8 + 2) * line_height)
+
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((40, 36), "DISPONIBILIDADES E INVERSIONES TEMPORARIAS - 30/04/2025", fontsize=11)
+        page.insert_text((40, 52), "SISTEMA DE INTERMEDIACION FINANCIERA", fontsize=10)
+        page.insert_text((40, 66), "(En millones de bolivianos)", fontsize=8)
+
+        y = 92
+        page.insert_text((40, y), "CONCEPTO", fontsize=7)
+        columns = []
+        for g in range(groups):
+            for k, name in enumerate(("MN+UFV", "ME+MV", "TOTAL")):
+                x = 250 + (g * 3 + k) * col_width
+                columns.append(x)
+                page.insert_text((x, y), name, fontsize=7)
+        y += line_height + 4
+
+        for i in range(rows):
+            if i % 8 == 0:
+                page.insert_text((40, y), ASFI_SECTIONS[(i // 8) % len(ASFI_SECTIONS)], fontsize=7)
+                y += line_height
+            page.insert_text((48, y), f"Cuenta {i + 1} de entidades financieras", fontsize=7)
+            for c, x in enumerate(columns):
+                value = rnd.uniform(-5_000, 900_000) if c % 3 != 2 else rnd.uniform(0, 1_500_000)
+                page.insert_text((x, y), _bolivian(value), fontsize=7)
+            y += line_height
+
+        page.insert_text((40, y + 10), "NOTA: datos sintéticos para benchmarks", fontsize=7)
+    path = Path(path)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_soat_pdf(path, pages: int = 1, departments: int = 9, vehicles: int = 13) -> Path:
+    """
+    Crea un PDF SOAT sintético: una grilla con reglas por página con
+    ``departments`` departamentos (3 filas cada uno) y ``vehicles`` columnas
+    de vehículo más TOTAL GENERAL.
+    """
+    vehicle_names = [SOAT_VEHICLES[i % len(SOAT_VEHICLES)] + ("" if i < len(SOAT_VEHICLES) else f" {i}")
+                     for i in range(vehicles)]
+    if "MOTOCICLETA" not in vehicle_names and vehicle_names:
+        vehicle_names[-1] = "MOTOCICLETA"
+    header = ["DEPARTAMENTO", "USO"] + vehicle_names + ["TOTAL GENERAL"]
+
+    body = []
+    for d in range(departments):
+        dept = SOAT_DEPARTMENTS[d % len(SOAT_DEPARTMENTS)] + ("" if d < len(SOAT_DEPARTMENTS) else f" {d}")
+        particular = [(d + 1) * 100 + v for v in range(vehicles)]
+        publico = [(d + 1) * 10 + v for v in range(vehicles)]
+        body.append([dept, "SERVICIO PARTICULAR"] + [f"{n:,}".replace(",", ".") for n in particular]
+                    + [f"{sum(particular):,}".replace(",", ".")])
+        body.append(["", "SERVICIO PÚBLICO"] + [str(n) for n in publico] + [str(sum(publico))])
+        totals = [a + b for a, b in zip(particular, publico)]
+        body.append([f"TOTAL {dept}", ""] + [f"{n:,}".replace(",", ".") for n in totals]
+                    + [f"{sum(totals):,}".replace(",", ".")])
+    grid = [header] + body
+
+    cell_w, cell_h, margin = 48, 14, 30
+    width = 2 * margin + 2 * 80 + cell_w * (len(header) - 2)
+    height = max(595, 110 + cell_h * len(grid))
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((margin, 36), "PARQUE AUTOMOTOR ASEGURADO SOAT", fontsize=12)
+        page.insert_text((margin, 52), "Por departamento y clase de vehículo al 30/06/2025", fontsize=10)
+        y0 = 80
+        for r, row in enumerate(grid):
+            x = margin
+            for c, value in enumerate(row):
+                w = 80 if c < 2 else cell_w
+                rect = fitz.Rect(x, y0 + r * cell_h, x + w, y0 + (r + 1) * cell_h)
+                page.draw_rect(rect, color=(0, 0, 0), width=0.4)
+                if value:
+                    page.insert_textbox(rect, value, fontsize=4.5, align=fitz.TEXT_ALIGN_LEFT)
+                x += w
+    path = Path(path)
+    doc.save(path)
+    doc.close()
+    return path
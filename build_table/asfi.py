@@ -1,107 +1,168 @@
+from collections.abc import Iterable, Iterator
+from functools import partial
+from numbers import Integral
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import re
 from extract_title.asfi import extract_asfi_title
-from extract_table.asfi import extract_asfi_table
+from extract_table.asfi import asfi_table_from_arrays, extract_asfi_table, page_words, save_temp_table
 from common.extract_date import extract_date
+from common.labels import ffill_labels
+from common.layout import words_to_arrays
+from common.schema import compact_long_table, concat_compact
+from common.long_format import iter_pages, replay_page
+from common.snapshot import save_snapshot, snapshot_dir
+from common.pdf_session import PdfSession, use_session
+from common.metrics import stage, count
+
+
+SECTION_KEYWORDS = r"\(A\)|\(B\)|TOTAL|DISPONIBILIDADES|INVERSIONES|PREVISION"
+FINAL_COLS = ["file", "titulo1", "nv1", "nv2", "nv3", "nv4", "nv5", "fecha", "valor", "valor_texto"]
+# Columnas de la tabla larga de varias páginas (iter_long_format)
+LONG_COLUMNS = FINAL_COLS[:1] + ["page"] + FINAL_COLS[1:]
+
+
+def _section_header_mask(s: pd.Series) -> pd.Series:
+    """Heurística simple para detectar encabezados de sección (sobre una columna de textos ya limpios)"""
+    length = s.str.len()
+    too_many_digits = s.str.count(r"\d") > length * 0.2
+    keyword = s.str.contains(SECTION_KEYWORDS, case=False, regex=True)
+    short_upper = s.str.isupper() & (length <= 60)
+    return (s != "") & ~too_many_digits & (keyword | short_upper)
 
 
 def _is_section_header(text: str) -> bool:
     """Heurística simple para detectar encabezados de sección"""
     if not isinstance(text, str) or not text.strip():
         return False
-    s = text.strip()
-    if len(re.findall(r"\d", s)) > len(s) * 0.2:
-        return False
-    if re.search(r"\(A\)|\(B\)|TOTAL|DISPONIBILIDADES|INVERSIONES|PREVISION", s, re.IGNORECASE):
-        return True
-    if s.isupper() and len(s) <= 60:
-        return True
-    return False
+    return bool(_section_header_mask(pd.Series([text.strip()])).iloc[0])
 
 
 def build_flat_table_asfi(df_raw: pd.DataFrame, titles: list, pdf_file: str, date_str: str,
                           unit: str = "En millones de bolivianos") -> pd.DataFrame:
-    rows = []
     pdf_name = str(pdf_file)
     titulo1 = titles[0] if titles else ""
-    value_cols = [c for c in df_raw.columns if c.upper() != "CONCEPTO"]
-
-    current_section, current_group = "", ""
-
-    for _, row in df_raw.iterrows():
-        concepto = str(row.get("CONCEPTO", "")).strip()
-        if concepto == "" and row[value_cols].isna().all().all():
-            continue
-
-        if _is_section_header(concepto):
-            current_section = concepto
-            continue
-
-        if concepto.isupper() and len(concepto) < 60:
-            current_group = concepto
-            continue
-
-        for col in value_cols:
-            raw_val = row.get(col, "")
-
-            # ✅ chequeo robusto
-            if isinstance(raw_val, (pd.Series, list, tuple)):
-                if all(pd.isna(v) for v in raw_val):
-                    continue
-            else:
-                if raw_val is None or (isinstance(raw_val, float) and pd.isna(raw_val)) or \
-                        str(raw_val).strip().lower() in ["nan", "none", ""]:
-                    continue
-
-            val = raw_val
-            if isinstance(raw_val, str):
-                t = raw_val.strip()
-                t = re.sub(r"[^\d\-\.,\(\)]", "", t)
-                if re.match(r"^\(.*\)$", t):
-                    t = "-" + t[1:-1]
-                try:
-                    val = float(t.replace(".", "").replace(",", "."))
-                except Exception:
-                    val = t
-
-            rows.append({
-                "file": pdf_name,
-                "titulo1": titulo1,
-                "nv1": current_section,
-                "nv2": concepto,
-                "nv3": current_group,
-                "nv4": str(col),
-                "nv5": unit,
-                "fecha": date_str,
-                "valor": val
-            })
-
-    df_final = pd.DataFrame(rows)
-    final_cols = ["file", "titulo1", "nv1", "nv2", "nv3", "nv4", "nv5", "fecha", "valor"]
-    for c in final_cols:
-        if c not in df_final.columns:
-            df_final[c] = ""
-    df_final = df_final[final_cols]
-    return df_final
+    value_pos = [i for i, c in enumerate(df_raw.columns) if str(c).upper() != "CONCEPTO"]
+    value_names = [str(df_raw.columns[i]) for i in value_pos]
+
+    if "CONCEPTO" in df_raw.columns:
+        concepto = df_raw["CONCEPTO"].astype(str).str.strip().reset_index(drop=True)
+    else:
+        concepto = pd.Series([""] * len(df_raw), dtype=object)
+
+    # Encabezados de sección y de grupo: se propagan hacia abajo y no generan valores
+    is_section = _section_header_mask(concepto)
+    is_group = ~is_section & concepto.str.isupper() & (concepto.str.len() < 60)
+    labels = concepto.to_numpy(dtype=object)
+    section = ffill_labels(labels, is_section.to_numpy())
+    group = ffill_labels(labels, is_group.to_numpy())
+    is_data = (~is_section & ~is_group).to_numpy()
+
+    # Formato largo: una fila por (fila de datos, columna de valores), en orden de filas
+    n_rows, n_cols = int(is_data.sum()), len(value_pos)
+    values = pd.Series(df_raw.iloc[:, value_pos].to_numpy(dtype=object)[is_data].ravel(), dtype=object)
+    row_idx = np.repeat(np.flatnonzero(is_data), n_cols)
+    col_names = np.tile(np.array(value_names, dtype=object), n_rows)
+
+    missing = values.isna() | values.astype(str).str.strip().str.lower().isin(["nan", "none", ""])
+    keep = ~missing.to_numpy()
+    values, row_idx, col_names = values[keep], row_idx[keep], col_names[keep]
+
+    df_final = pd.DataFrame({
+        "file": pdf_name,
+        "titulo1": titulo1,
+        "nv1": section[row_idx],
+        "nv2": labels[row_idx],
+        "nv3": group[row_idx],
+        "nv4": col_names,
+        "nv5": unit,
+        "fecha": date_str,
+        "valor": values.to_numpy(),
+    })
+    # Etiquetas categóricas, fecha real y valor float (texto solo si no es número)
+    return compact_long_table(df_final, "valor", "valor_texto", "fecha")[FINAL_COLS]
+
+
+def process_pdf_to_long_format(pdf_path, page_number: int | Iterable[int], extractor: str = "ASFI",
+                               session: PdfSession | None = None,
+                               word_backend: str = "pdfplumber", save_temp: bool = False) -> pd.DataFrame:
+    """
+    page_number: una página (int) o varias (lista / range). Con varias, el
+    documento se recorre una sola vez y cada fila lleva su ``page``.
+    save_temp: guardar también la tabla cruda de cada página en ``data/temp`` (depuración).
+    """
+    pdf_path = Path(pdf_path)
+    if isinstance(page_number, Integral):
+        with use_session(pdf_path, session) as session:
+            return _process_page(pdf_path, page_number, session, word_backend, save_temp)
 
+    return concat_pages(list(iter_long_format(pdf_path, page_number, session, word_backend, save_temp)))
 
-def process_pdf_to_long_format(pdf_path, page_number: int, extractor: str = "ASFI") -> pd.DataFrame:
-    pdf_path = Path(pdf_path)
-    titulo = extract_asfi_title(pdf_path, page_number)
+
+def concat_pages(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    """Une las tablas de varias páginas (con columna ``page``) manteniendo las categorías."""
+    if not chunks:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+    return concat_compact(chunks)
+
+
+def iter_long_format(pdf_path, pages: int | Iterable[int], session: PdfSession | None = None,
+                     word_backend: str = "pdfplumber", save_temp: bool = False,
+                     errors: list | None = None) -> Iterator[pd.DataFrame]:
+    """Tabla larga de cada página de ``pages``, en una pasada (ver ``common.long_format.iter_pages``)."""
+    return iter_pages(pdf_path, pages, session,
+                      partial(_process_page, word_backend=word_backend, save_temp=save_temp), errors)
+
+
+def _process_page(pdf_path: Path, page_number: int, session: PdfSession,
+                  word_backend: str = "pdfplumber", save_temp: bool = False) -> pd.DataFrame:
+    with stage("title"):
+        titulo = extract_asfi_title(pdf_path, page_number, session=session)
     titles = [titulo] if titulo else []
 
+    with stage("date"):
+        fecha_detectada = _page_date(titles, pdf_path.name)
+
+    with stage("table", backend=word_backend):
+        df_raw = extract_asfi_table(pdf_path, page_number, session=session, word_backend=word_backend)
+        count(rows=df_raw.shape[0], cols=df_raw.shape[1])
+
+    if save_temp:
+        # Fuera de extract_asfi_table: también con la caché de extracciones
+        with stage("temp"):
+            save_temp_table(df_raw, pdf_path, page_number)
+
+    if snapshot_dir():
+        with stage("snapshot"):
+            words = page_words(session, page_number, word_backend)
+            save_snapshot(pdf_path, page_number, "ASFI", words_to_arrays(words),
+                          {"titles": titles, "word_backend": word_backend})
+
+    with stage("flatten"):
+        df_final = _flatten(df_raw, titles, pdf_path.name, fecha_detectada)
+        count(rows=len(df_final))
+
+    return df_final
+
+
+def _page_date(titles: list, pdf_name: str) -> str:
     try:
-        fecha_detectada = extract_date(titles, pdf_path.name)
+        return extract_date(titles, pdf_name)
     except Exception:
-        m = re.search(r"(\d{2}/\d{2}/\d{4})", titulo)
-        fecha_detectada = m.group(1) if m else ""
+        m = re.search(r"(\d{2}/\d{2}/\d{4})", titles[0] if titles else "")
+        return m.group(1) if m else ""
+
 
-    df_raw = extract_asfi_table(pdf_path, page_number, save_temp=True)
-    df_final = build_flat_table_asfi(df_raw, titles, pdf_path.name, fecha_detectada)
+def _flatten(df_raw: pd.DataFrame, titles: list, pdf_name: str, fecha_detectada: str) -> pd.DataFrame:
+    df_final = build_flat_table_asfi(df_raw, titles, pdf_name, fecha_detectada)
 
     if fecha_detectada and re.match(r"\d{2}/\d{2}/\d{4}", fecha_detectada):
         dd, mm, yyyy = fecha_detectada.split("/")
-        df_final["fecha"] = f"{yyyy}-{mm}-{dd}"
-
+        df_final["fecha"] = pd.to_datetime(f"{yyyy}-{mm}-{dd}", format="%Y-%m-%d", errors="coerce")
     return df_final
+
+
+def replay_snapshot(snapshot_file) -> pd.DataFrame:
+    """Tabla larga de una página desde su instantánea de palabras (sin abrir el PDF)."""
+    return replay_page(snapshot_file, _page_date, lambda arrays, meta: asfi_table_from_arrays(arrays), _flatten)
@@ -1,97 +1,180 @@
+from collections.abc import Iterable, Iterator
+from functools import partial
+from numbers import Integral
+from pathlib import Path
+import numpy as np
 import pandas as pd
 from extract_title.soat import extract_titles
 from common.extract_date import extract_date
+from common.labels import ffill_labels
+from common.pdf_session import PdfSession, use_session
+from common.metrics import stage, count
+from common.schema import compact_long_table, concat_compact
+from common.long_format import iter_pages, replay_page
+from common.snapshot import save_snapshot, snapshot_dir
 
-from extract_table.soat import extract_table_from_pdf
+from extract_table.soat import extract_table_from_pdf, raw_grid, soat_table_from_grid
 
-def build_flat_table(df_raw: pd.DataFrame, titles: dict, pdf_file: str, date_str: str) -> list:
-    rows = []
+MAX_TITLES = 5
+# Columnas de la tabla larga de varias páginas (iter_long_format / concat_pages)
+LONG_COLUMNS = (["file", "page"] + [f"title_{i}" for i in range(1, MAX_TITLES + 1)]
+                + ["nv1", "nv2", "nv3", "date", "value", "value_text"])
+
+SERVICE_LABELS = ['SERVICIO PARTICULAR', 'SERVICIO PÚBLICO', 'servicio particular', 'servicio público']
+
+
+def build_flat_table(df_raw: pd.DataFrame, titles: dict, pdf_file: str, date_str: str) -> pd.DataFrame:
+    """
+    Pasa la grilla SOAT a formato largo: una fila por (fila de datos, columna de vehículo).
+    La fila 0 es la cabecera de vehículos; columnas 0 y 1 son departamento y uso.
+    """
     department_col, use_col = 0, 1
-    vehicle_cols = list(range(2, len(df_raw.columns)))
-    for i, row in df_raw.iterrows():
-        if i == 0:
-            continue
-        dept = str(row[department_col]).strip()
-        use = str(row[use_col]).strip()
-        if dept == "" and use == "":
-            continue
-        for col_idx in vehicle_cols:
-            vehicle = df_raw.iloc[0, col_idx].replace("\n", " / ").strip()
-            if not vehicle:
-                continue
-            value = str(row[col_idx]).strip()
-            if value.lower() in ["none", "nan"]:
-                value = ""
-            row_data = {"file": pdf_file}
-            row_data.update(titles)
-            row_data.update({
-                "nv1": dept,
-                "nv2": use,
-                "nv3": vehicle,
-                "date": date_str,
-                "value": value
-            })
-            rows.append(row_data)
-    return rows
+    header = df_raw.iloc[0, 2:].astype(str).str.replace("\n", " / ", regex=False).str.strip()
+    vehicle_mask = (header != "").to_numpy()
+    vehicles = header.to_numpy(dtype=object)[vehicle_mask]
+
+    body = df_raw[df_raw.index != 0]
+    dept = body.iloc[:, department_col].astype(str).str.strip()
+    use = body.iloc[:, use_col].astype(str).str.strip()
+    keep = ~((dept == "") & (use == ""))
+    dept, use = dept[keep].to_numpy(dtype=object), use[keep].to_numpy(dtype=object)
+
+    values = body.iloc[:, 2:].loc[keep.to_numpy(), vehicle_mask].to_numpy(dtype=object).ravel()
+    values = pd.Series(values, dtype=object).astype(str).str.strip()
+    values = values.mask(values.str.lower().isin(["none", "nan"]), "")
+
+    n_vehicles = len(vehicles)
+    data = {"file": pdf_file}
+    data.update(titles)
+    data.update({
+        "nv1": np.repeat(dept, n_vehicles),
+        "nv2": np.repeat(use, n_vehicles),
+        "nv3": np.tile(vehicles, len(dept)),
+        "date": date_str,
+        "value": values.to_numpy(dtype=object),
+    })
+    return pd.DataFrame(data)
 
 def clean_service_logic(df_temp: pd.DataFrame, titles: dict) -> pd.DataFrame:
-    service_labels = ['SERVICIO PARTICULAR', 'SERVICIO PÚBLICO', 'servicio particular', 'servicio público']
-    current_service = None
-    clean_rows = []
-    for _, row in df_temp.iterrows():
-        nv1, nv2, nv3, value = row['nv1'], row['nv2'], row['nv3'], row['value']
-        if 'uso' in nv3.lower() and value in service_labels:
-            current_service = value
-            continue
-        nv1_fixed, nv2_fixed = nv1, nv2
-        if nv2.upper().startswith('TOTAL '):
-            dept_name = nv2[6:].strip()
-            nv1_fixed, nv2_fixed = dept_name, 'TOTAL'
-        elif nv1.upper().startswith('TOTAL '):
-            dept_name = nv1[6:].strip()
-            nv1_fixed, nv2_fixed = dept_name, 'TOTAL'
-        elif nv2 == '':
-            nv2_fixed = current_service if current_service else nv2
-        clean_row = {'file': row['file']}
-        for title_key in titles.keys():
-            clean_row[title_key] = row.get(title_key, '')
-        clean_row.update({
-            'nv1': nv1_fixed,
-            'nv2': nv2_fixed,
-            'nv3': nv3,
-            'date': row['date'],
-            'value': value
-        })
-        clean_rows.append(clean_row)
-    return pd.DataFrame(clean_rows)
-
-def process_pdf_to_long_format(pdf_path, page_number: int, extractor: str = "SOAT") -> pd.DataFrame:
+    """
+    Propaga el tipo de servicio (particular / público) a las filas sin uso y
+    separa las filas 'TOTAL <departamento>' en nv1 = departamento, nv2 = 'TOTAL'.
+    """
+    nv1, nv2, nv3, value = df_temp['nv1'], df_temp['nv2'], df_temp['nv3'], df_temp['value']
+
+    # Filas marcador de servicio: fijan el servicio vigente y se descartan
+    is_service = nv3.str.lower().str.contains('uso', regex=False) & value.isin(SERVICE_LABELS)
+    current_service = ffill_labels(value.to_numpy(dtype=object), is_service.to_numpy())
+
+    total_in_nv2 = nv2.str.upper().str.startswith('TOTAL ')
+    total_in_nv1 = ~total_in_nv2 & nv1.str.upper().str.startswith('TOTAL ')
+    is_total = total_in_nv2 | total_in_nv1
+    use_service = ~is_total & (nv2 == '') & (current_service != '')
+
+    nv1_fixed = nv1.mask(total_in_nv2, nv2.str[6:].str.strip())
+    nv1_fixed = nv1_fixed.mask(total_in_nv1, nv1.str[6:].str.strip())
+    nv2_fixed = nv2.mask(is_total, 'TOTAL').mask(use_service, pd.Series(current_service, index=nv2.index))
+
+    clean = {'file': df_temp['file']}
+    for title_key in titles.keys():
+        clean[title_key] = df_temp[title_key] if title_key in df_temp.columns else ''
+    clean.update({
+        'nv1': nv1_fixed,
+        'nv2': nv2_fixed,
+        'nv3': nv3,
+        'date': df_temp['date'],
+        'value': value,
+    })
+    df_clean = pd.DataFrame(clean, index=df_temp.index)
+    return df_clean[~is_service].reset_index(drop=True)
+
+def process_pdf_to_long_format(pdf_path, page_number: int | Iterable[int], extractor: str = "SOAT",
+                               session: PdfSession | None = None,
+                               table_backend: str = "pdfplumber") -> pd.DataFrame:
     """
     pdf_path: str o Path
+    page_number: una página (int) o varias (lista / range); con varias, cada fila lleva su ``page``
+    session: sesión PDF compartida (opcional); si no se pasa, se abre una para esta llamada
+    table_backend: "pdfplumber" (por defecto) o "pymupdf" para detectar la grilla
     """
-    from pathlib import Path
     pdf_path = Path(pdf_path)  # asegura que sea Path
 
+    if isinstance(page_number, Integral):
+        with use_session(pdf_path, session) as session:
+            return _process_page(pdf_path, page_number, session, table_backend)
+
+    return concat_pages(list(iter_long_format(pdf_path, page_number, session, table_backend)))
+
+
+def iter_long_format(pdf_path, pages: int | Iterable[int], session: PdfSession | None = None,
+                     table_backend: str = "pdfplumber", errors: list | None = None) -> Iterator[pd.DataFrame]:
+    """Tabla larga de cada página de ``pages``, en una pasada (ver ``common.long_format.iter_pages``)."""
+    return iter_pages(pdf_path, pages, session, partial(_process_page, table_backend=table_backend), errors)
+
+
+def concat_pages(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Une las tablas de varias páginas. Cada página puede tener distinta cantidad
+    de títulos: las columnas ``title_N`` faltantes quedan vacías.
+    """
+    if not chunks:
+        return pd.DataFrame(columns=[c for c in LONG_COLUMNS if not c.startswith("title_")])
+    title_cols = sorted({c for chunk in chunks for c in chunk.columns if c.startswith("title_")},
+                        key=lambda c: int(c[6:]))
+    chunks = [chunk.assign(**{c: pd.Categorical([""] * len(chunk)) for c in title_cols if c not in chunk.columns})
+              for chunk in chunks]
+    df = concat_compact(chunks)
+    return df[["file", "page"] + title_cols + ["nv1", "nv2", "nv3", "date", "value", "value_text"]]
+
+
+def _process_page(pdf_path, page_number: int, session: PdfSession,
+                  table_backend: str = "pdfplumber") -> pd.DataFrame:
     # Extraer títulos
-    titles = extract_titles(pdf_path, page_number, max_titles=5)
-    titles_dict = {f"title_{i+1}": t for i, t in enumerate(titles)}
+    with stage("title"):
+        titles = extract_titles(pdf_path, page_number, max_titles=MAX_TITLES, session=session)
 
     # Extraer fecha
-    fecha_detectada = extract_date(titles, pdf_path.name)
+    with stage("date"):
+        fecha_detectada = extract_date(titles, pdf_path.name)
 
     # Extraer tabla
-    df_raw = extract_table_from_pdf(str(pdf_path), page_number)
+    with stage("table", backend=table_backend):
+        df_raw = extract_table_from_pdf(str(pdf_path), page_number, session=session,
+                                        table_backend=table_backend)
+        count(rows=df_raw.shape[0], cols=df_raw.shape[1])
+
+    if snapshot_dir():
+        with stage("snapshot"):
+            grid = raw_grid(session, page_number, table_backend)
+            save_snapshot(pdf_path, page_number, "SOAT",
+                          {"grid": np.array([["" if c is None else c for c in row] for row in grid], dtype=str)},
+                          {"titles": titles, "table_backend": table_backend})
+
+    with stage("flatten"):
+        df_final = _flatten(df_raw, titles, pdf_path.name, fecha_detectada)
+        count(rows=len(df_final))
+
+    return df_final
+
+
+def _flatten(df_raw: pd.DataFrame, titles: list, pdf_name: str, fecha_detectada: str) -> pd.DataFrame:
+    titles_dict = {f"title_{i+1}": t for i, t in enumerate(titles)}
 
     # Construir tabla plana
-    rows = build_flat_table(df_raw, titles_dict, pdf_path.name, fecha_detectada)
-    df_temp = pd.DataFrame(rows)
+    df_temp = build_flat_table(df_raw, titles_dict, pdf_name, fecha_detectada)
 
     # Limpiar tabla
     df_final = clean_service_logic(df_temp, titles_dict)
-    df_final['date'] = "'" + df_final['date'].astype(str)
 
     # Reordenar columnas
     final_cols = ["file"] + sorted(titles_dict.keys()) + ["nv1", "nv2", "nv3", "date", "value"]
     df_final = df_final[final_cols]
 
-    return df_final
+    # Etiquetas categóricas, fecha real y valor float (texto solo si no es número)
+    return compact_long_table(df_final, "value", "value_text", "date")
+
+
+def replay_snapshot(snapshot_file) -> pd.DataFrame:
+    """Tabla larga de una página desde su instantánea de la grilla (sin abrir el PDF)."""
+    return replay_page(snapshot_file, extract_date,
+                       lambda arrays, meta: soat_table_from_grid(arrays["grid"].tolist(), meta["page"]), _flatten)
@@ -0,0 +1,168 @@
+"""
+Caché en disco de resultados de extracción (tablas y títulos).
+
+La clave combina el hash del contenido del PDF, el número de página, el
+extractor, su versión y sus parámetros, así que renombrar o mover el archivo
+no invalida la caché y cambiar la lógica de un extractor (subiendo su versión)
+sí. Las tablas se guardan en Parquet; los títulos, en JSON. El tamaño total se
+acota con desalojo LRU.
+
+Se activa con la variable de entorno CONVERSOR_CACHE_DIR (la CLI la fija con
+--cache-dir).
+"""
+from functools import wraps
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+
+from common.metrics import count
+
+CACHE_DIR_ENV = "CONVERSOR_CACHE_DIR"
+CACHE_MAX_MB_ENV = "CONVERSOR_CACHE_MAX_MB"
+DEFAULT_MAX_MB = 512
+
+_MISSING = object()
+_file_hashes = {}
+
+
+def file_hash(pdf_path) -> str:
+    """SHA-256 del contenido, memorizado por (ruta, tamaño, mtime) dentro del proceso."""
+    path = Path(pdf_path).resolve()
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_hashes.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_hashes[memo_key] = digest
+    return digest
+
+
+class ExtractionCache:
+    """Directorio de entradas ``<clave>.json`` (+ ``<clave>.parquet`` para tablas)."""
+
+    def __init__(self, cache_dir, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self, pdf_path, page_number: int, extractor: str, version: str, params: str = "") -> str:
+        raw = f"{file_hash(pdf_path)}|{page_number}|{extractor}|{version}|{params}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --------------------------------------------------------
+    # Lectura / escritura
+    # --------------------------------------------------------
+    def get(self, key: str):
+        import pandas as pd
+        meta_file = self.cache_dir / f"{key}.json"
+        try:
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            if meta["kind"] == "frame":
+                data_file = self.cache_dir / f"{key}.parquet"
+                value = pd.read_parquet(data_file)
+                value.columns = meta["columns"]
+                os.utime(data_file)
+            else:
+                value = meta["value"]
+            os.utime(meta_file)  # marca de uso para el LRU
+        except (OSError, ValueError, KeyError):
+            return _MISSING
+        return value
+
+    def put(self, key: str, value) -> None:
+        import pandas as pd
+        meta_file = self.cache_dir / f"{key}.json"
+        if isinstance(value, pd.DataFrame):
+            # Parquet exige nombres de columna únicos y de texto: se guardan por posición
+            frame = value.reset_index(drop=True)
+            frame.columns = [f"c{i}" for i in range(len(frame.columns))]
+            self._atomic_write(self.cache_dir / f"{key}.parquet",
+                               lambda tmp: frame.to_parquet(tmp, compression="zstd", index=False))
+            meta = {"kind": "frame", "columns": list(value.columns)}
+        else:
+            meta = {"kind": "json", "value": value}
+        payload = json.dumps(meta, ensure_ascii=False)
+        self._atomic_write(meta_file, lambda tmp: Path(tmp).write_text(payload, encoding="utf-8"))
+        self.evict()
+
+    def _atomic_write(self, target: Path, write) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    # --------------------------------------------------------
+    # Desalojo LRU
+    # --------------------------------------------------------
+    def evict(self) -> None:
+        """Borra las entradas usadas hace más tiempo hasta quedar bajo ``max_bytes``."""
+        entries = {}
+        for f in self.cache_dir.iterdir():
+            if f.suffix not in (".json", ".parquet"):
+                continue
+            try:
+                stat = f.stat()
+            except OSError:
+                continue
+            size, last_used = entries.get(f.stem, (0, 0))
+            entries[f.stem] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            for suffix in (".json", ".parquet"):
+                try:
+                    (self.cache_dir / f"{key}{suffix}").unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+
+def get_default_cache() -> ExtractionCache | None:
+    """Caché configurada por entorno, o None si está desactivada."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    max_mb = float(os.environ.get(CACHE_MAX_MB_ENV, DEFAULT_MAX_MB))
+    return ExtractionCache(cache_dir, int(max_mb * 1024 * 1024))
+
+
+def cached_extraction(extractor: str, version: str):
+    """
+    Decorador para funciones ``f(pdf_path_o_sesion, page_number, ...)``.
+    El argumento ``session`` no forma parte de la clave.
+    Las excepciones no se cachean.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(source, page_number, *args, **kwargs):
+            cache = get_default_cache()
+            if cache is None:
+                return func(source, page_number, *args, **kwargs)
+
+            pdf_path = getattr(source, "path", source)
+            params = {k: v for k, v in kwargs.items() if k != "session"}
+            key = cache.key(pdf_path, page_number, extractor, version,
+                            repr((args, sorted(params.items()))))
+            value = cache.get(key)
+            if value is not _MISSING:
+                count(cache="hit")
+                return value
+
+            count(cache="miss")
+            value = func(source, page_number, *args, **kwargs)
+            cache.put(key, value)
+            return value
+        return wrapper
+    return decorator
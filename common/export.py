@@ -0,0 +1,235 @@
+"""
+Escritura de la tabla larga final en Excel, Parquet o CSV.
+
+Excel se escribe siempre en streaming (openpyxl en modo write-only): las filas
+van directo al XML de la hoja sin armar el modelo de celdas en memoria. Un
+mismo libro puede llevar varias hojas (p.ej. una por página o por boletín).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import os
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OUTPUT_FORMATS = {
+    "excel": ".xlsx",
+    "parquet": ".parquet",
+    "csv": ".csv",
+}
+DATE_COLUMNS = ("fecha", "date")
+SHEET_NAME_MAX = 31  # límite de Excel
+
+
+def date_text(s: pd.Series) -> pd.Series:
+    """Fecha como texto 'YYYY-MM-DD' (vacío si falta), sea ``datetime64`` o texto."""
+    import pandas as pd
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime("%Y-%m-%d").fillna("")
+    return s.astype(str)
+
+
+def _for_excel(df: pd.DataFrame) -> pd.DataFrame:
+    # En Excel las fechas van como texto 'YYYY-MM-DD', igual que siempre;
+    # Excel convierte ese texto a fecha local, así que en SOAT se fuerza con un apóstrofo
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = date_text(df[col])
+    if "date" in df.columns:
+        df["date"] = "'" + df["date"]
+    return df
+
+
+def _with_real_dates(df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
+    return df
+
+
+def sheet_name(name: str, used=()) -> str:
+    """
+    Nombre de hoja válido para Excel: sin ``[]:*?/\\``, de hasta 31
+    caracteres y distinto de los de ``used`` (agrega "_2", "_3"... si se repite).
+    """
+    base = re.sub(r"[\[\]:*?/\\]", "_", str(name)).strip("'") or "Hoja"
+    candidate, n = base[:SHEET_NAME_MAX], 1
+    taken = {u.lower() for u in used}
+    while candidate.lower() in taken:
+        n += 1
+        suffix = f"_{n}"
+        candidate = base[:SHEET_NAME_MAX - len(suffix)] + suffix
+    return candidate
+
+
+def _output_file(output_base: Path, output_format: str) -> Path:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de salida '{output_format}' no reconocido. "
+                         f"Usa uno de: {', '.join(OUTPUT_FORMATS)}")
+    output_base = Path(output_base)
+    output_file = output_base.parent / (output_base.name + OUTPUT_FORMATS[output_format])
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    return output_file
+
+
+def write_long_table(df: pd.DataFrame, output_base: Path, output_format: str = "excel") -> Path:
+    """
+    Escribe ``df`` en ``output_base`` + la extensión del formato y devuelve la ruta.
+    Excel es el formato por defecto para analistas; Parquet (zstd) para cargas posteriores.
+    """
+    output_file = _output_file(output_base, output_format)
+
+    if output_format == "excel":
+        with LongTableWriter(output_base, output_format) as writer:
+            writer.write(df)
+    elif output_format == "parquet":
+        _with_real_dates(df).to_parquet(output_file, compression="zstd", index=False)
+    else:
+        df.to_csv(output_file, index=False)
+    return output_file
+
+
+def write_workbook(sheets, output_file: Path) -> Path:
+    """
+    Escribe varias tablas en un solo libro Excel, una hoja por tabla.
+    ``sheets``: pares (nombre, DataFrame), p.ej. un generador que lee cada
+    tabla recién cuando le toca, así solo una está en memoria.
+    """
+    output_file = Path(output_file)
+    with LongTableWriter(output_file.with_suffix(""), "excel") as writer:
+        for name, df in sheets:
+            writer.write(df, sheet=sheet_name(name, writer.sheets))
+    return writer.path
+
+
+class LongTableWriter:
+    """
+    Escritura incremental de la tabla larga, bloque por bloque (p.ej. una
+    página a la vez), sin juntar todo el documento en memoria: CSV por anexado,
+    Parquet por row groups y Excel con un libro openpyxl en modo write-only.
+
+    Las columnas las fija ``columns`` (o el primer bloque); los bloques
+    siguientes se alinean a ellas y las que falten quedan vacías. En Excel,
+    ``write(df, sheet=...)`` con otro nombre abre una hoja nueva con su propio
+    encabezado (en CSV y Parquet ``sheet`` se ignora).
+
+    Se escribe en un ``.part`` junto al destino y se renombra recién al cerrar:
+    si el bloque ``with`` termina con una excepción, no queda una salida a medias.
+    """
+
+    def __init__(self, output_base: Path, output_format: str = "excel", columns: list | None = None):
+        self.path = _output_file(output_base, output_format)
+        self._part = self.path.with_name(f"{self.path.stem}.part{self.path.suffix}")
+        self.output_format = output_format
+        self.columns = list(columns) if columns else None
+        self.rows = 0
+        self._started = False
+        self._parquet = None
+        self._schema = None
+        self._fixed_columns = self.columns
+        self._workbook = None
+        self._sheet = None
+        self._sheet_name = None
+        self.sheets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _align(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.columns is None:
+            self.columns = [str(c) for c in df.columns]
+        if [str(c) for c in df.columns] == self.columns:
+            # Mismo orden: sin reindexar (las tablas crudas ASFI repiten encabezados,
+            # p.ej. MN+UFV / ME+MV / TOTAL por grupo, y df[cols] los duplicaría)
+            return df
+        if not df.columns.is_unique:
+            raise ValueError(f"No se pueden alinear columnas repetidas: {list(df.columns)}")
+        extra = [c for c in df.columns if c not in self.columns]
+        if extra:
+            raise ValueError(f"Columnas no previstas en la salida incremental: {extra}")
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            df = df.assign(**{c: None for c in missing})
+        return df[self.columns]
+
+    def write(self, df: pd.DataFrame, sheet: str | None = None) -> None:
+        if self.output_format == "excel" and self._workbook is not None and sheet != self._sheet_name:
+            self._sheet = None
+            self.columns = self._fixed_columns
+        df = self._align(df)
+        if self.output_format == "csv":
+            df.to_csv(self._part, mode="a" if self._started else "w", header=not self._started, index=False)
+        elif self.output_format == "parquet":
+            self._write_parquet(df)
+        else:
+            self._write_excel(df, sheet)
+        self._started = True
+        self.rows += len(df)
+
+    def _write_parquet(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(_with_real_dates(df), preserve_index=False)
+        if self._parquet is None:
+            # Columnas vacías en el primer bloque (p.ej. títulos SOAT): texto. Las
+            # categóricas con índice int32, para admitir bloques con más categorías
+            self._schema = pa.schema([
+                f.with_type(pa.string()) if pa.types.is_null(f.type)
+                else f.with_type(pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type)
+                else f
+                for f in table.schema
+            ]).remove_metadata()
+            self._parquet = pq.ParquetWriter(self._part, self._schema, compression="zstd")
+        self._parquet.write_table(table.cast(self._schema))
+
+    def _write_excel(self, df: pd.DataFrame, sheet: str | None = None) -> None:
+        if self._workbook is None:
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+        if self._sheet is None:
+            self._sheet_name = sheet
+            title = sheet_name(sheet or "Sheet1", self.sheets)
+            self._sheet = self._workbook.create_sheet(title)
+            self.sheets.append(title)
+            self._sheet.append(self.columns)
+        df = _for_excel(df)
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            self._sheet.append(row)
+
+    def close(self) -> Path:
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._workbook is not None:
+            self._workbook.save(self._part)
+            self._workbook = None
+        if self._part.exists():
+            os.replace(self._part, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """Descarta lo escrito: no se crea (ni se reemplaza) la salida."""
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._workbook is not None:
+            # Guardar cierra las hojas write-only y borra sus temporales de openpyxl
+            try:
+                self._workbook.save(self._part)
+            finally:
+                self._workbook = None
+        self._part.unlink(missing_ok=True)
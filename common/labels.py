@@ -0,0 +1,12 @@
+import numpy as np
+
+
+def ffill_labels(labels: np.ndarray, mask: np.ndarray, default="") -> np.ndarray:
+    """
+    Propaga hacia abajo la última etiqueta marcada por ``mask``.
+    Las posiciones anteriores a la primera etiqueta quedan con ``default``.
+    """
+    labels = np.asarray(labels, dtype=object)
+    last = np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+    out = labels[np.maximum(last, 0)] if len(labels) else np.empty(0, dtype=object)
+    return np.where(last >= 0, out, default).astype(object)
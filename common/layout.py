@@ -0,0 +1,95 @@
+"""
+Utilidades de layout sobre coordenadas de palabras en arreglos NumPy:
+agrupación en líneas por tolerancia vertical, asignación de columnas con
+``searchsorted`` y armado de la grilla de celdas, sin bucles por palabra.
+"""
+import numpy as np
+
+DEFAULT_Y_TOLERANCE = 1.0
+
+
+def words_to_arrays(words: list, top_key: str = "top") -> dict:
+    """Convierte una lista de palabras (dicts con text/x0/x1/top) en arreglos."""
+    n = len(words)
+    return {
+        "text": np.array([w["text"] for w in words], dtype=object) if n else np.empty(0, dtype=object),
+        "x0": np.fromiter((w["x0"] for w in words), dtype=float, count=n),
+        "x1": np.fromiter((w.get("x1", w["x0"]) for w in words), dtype=float, count=n),
+        "top": np.fromiter((w[top_key] for w in words), dtype=float, count=n),
+    }
+
+
+def group_lines(top: np.ndarray, y_tolerance: float = DEFAULT_Y_TOLERANCE) -> np.ndarray:
+    """
+    Asigna un número de línea a cada palabra (0 = la más alta).
+    Ordena por ``top`` y abre una línea nueva cuando el salto con la palabra
+    anterior supera ``y_tolerance``.
+    """
+    if len(top) == 0:
+        return np.empty(0, dtype=int)
+    order = np.argsort(top, kind="stable")
+    breaks = np.diff(top[order]) > y_tolerance
+    sorted_ids = np.concatenate(([0], np.cumsum(breaks)))
+    line_id = np.empty(len(top), dtype=int)
+    line_id[order] = sorted_ids
+    return line_id
+
+
+def _segments(keys: np.ndarray):
+    """Inicio y fin de cada tramo de claves iguales (``keys`` ya ordenadas)."""
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(keys))
+    return starts, ends
+
+
+def line_texts(text: np.ndarray, line_id: np.ndarray, x0: np.ndarray | None = None) -> list[str]:
+    """
+    Texto de cada línea (de arriba hacia abajo), uniendo palabras con espacios.
+    Si se pasa ``x0`` las palabras se ordenan de izquierda a derecha; si no,
+    se respeta el orden original dentro de la línea.
+    """
+    if len(text) == 0:
+        return []
+    order = np.lexsort((x0, line_id)) if x0 is not None else np.argsort(line_id, kind="stable")
+    sorted_text = text[order]
+    starts, ends = _segments(line_id[order])
+    return [" ".join(sorted_text[s:e]) for s, e in zip(starts, ends)]
+
+
+def assign_columns(x: np.ndarray, lefts: np.ndarray, positions: np.ndarray,
+                   width: float = 100.0) -> np.ndarray:
+    """
+    Índice de columna para cada ``x``: la primera columna cuyo borde izquierdo
+    cumple ``left <= x < left + width``; si ninguna, la de posición más cercana.
+    ``lefts`` debe estar en orden creciente.
+    """
+    lefts = np.asarray(lefts, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    idx = np.searchsorted(lefts, x - width, side="right")
+    valid = idx < len(lefts)
+    valid[valid] = lefts[idx[valid]] <= x[valid]
+    if not valid.all():
+        nearest = np.abs(x[~valid, None] - positions[None, :]).argmin(axis=1)
+        idx[~valid] = nearest
+    return idx
+
+
+def build_grid(line_id: np.ndarray, col_id: np.ndarray, x0: np.ndarray, text: np.ndarray,
+               n_cols: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Une las palabras de cada celda (línea, columna) de izquierda a derecha.
+    Devuelve ``(lineas, grilla)``: las líneas presentes en orden y una grilla
+    de textos (objeto) de forma ``(len(lineas), n_cols)``.
+    """
+    lines = np.unique(line_id)
+    grid = np.full((len(lines), n_cols), "", dtype=object)
+    if len(text) == 0:
+        return lines, grid
+    order = np.lexsort((x0, col_id, line_id))
+    row_pos = np.searchsorted(lines, line_id[order])
+    cols = col_id[order]
+    sorted_text = text[order]
+    starts, ends = _segments(row_pos * n_cols + cols)
+    for s, e in zip(starts, ends):
+        grid[row_pos[s], cols[s]] = " ".join(sorted_text[s:e])
+    return lines, grid
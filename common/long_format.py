@@ -0,0 +1,66 @@
+"""
+Recorridos genéricos de la tabla larga, compartidos por los extractores.
+
+Cada extractor aporta sus funciones por página (procesar una página, la fecha,
+la tabla desde la capa cruda y el aplanado); acá viven el recorrido de varias
+páginas sobre una sesión y el reprocesamiento desde una instantánea.
+"""
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+
+from common.metrics import count, logger, metrics_context, stage
+from common.page_index import as_page_list
+from common.pdf_session import PdfSession, use_session
+from common.snapshot import load_snapshot
+
+
+def iter_pages(pdf_path, pages: int | Iterable[int], session: PdfSession | None,
+               process_page: Callable, errors: list | None = None) -> Iterator:
+    """
+    Recorre ``pages`` sobre un único documento abierto y entrega
+    ``process_page(pdf_path, página, session)`` de cada una, con la columna
+    ``page`` después de ``file``. Cada página se libera de la sesión al
+    terminarla, así la memoria no crece con el largo del documento.
+
+    Con ``errors`` (una lista), una página que falla se anota como
+    ``(página, "Tipo: mensaje")`` y se sigue con la próxima; sin ella, el
+    error corta el recorrido.
+    """
+    pdf_path = Path(pdf_path)
+    pages = as_page_list(pages)
+    with use_session(pdf_path, session) as session:
+        for page in pages:
+            try:
+                with metrics_context(page=page):
+                    df_page = process_page(pdf_path, page, session)
+            except Exception as e:
+                if errors is None:
+                    raise
+                errors.append((page, f"{type(e).__name__}: {e}"))
+                logger.warning(f"⚠️ {pdf_path.name} p{page}: {type(e).__name__}: {e}")
+                continue
+            finally:
+                session.release_page(page)
+            df_page.insert(1, "page", page)
+            yield df_page
+
+
+def replay_page(snapshot_file, page_date: Callable, raw_table: Callable, flatten: Callable):
+    """
+    Tabla larga de una página desde su instantánea, sin abrir el PDF: los
+    títulos guardados pasan por ``page_date(titles, pdf)``, la capa cruda por
+    ``raw_table(arrays, meta)`` y el resultado por
+    ``flatten(df_raw, titles, pdf, fecha)``.
+    """
+    arrays, meta = load_snapshot(snapshot_file)
+    titles, pdf_name = meta["titles"], meta["pdf"]
+    with metrics_context(pdf=pdf_name, page=meta["page"], extractor=meta["extractor"]):
+        with stage("date"):
+            fecha_detectada = page_date(titles, pdf_name)
+        with stage("table", backend="snapshot"):
+            df_raw = raw_table(arrays, meta)
+            count(rows=df_raw.shape[0], cols=df_raw.shape[1])
+        with stage("flatten"):
+            df_final = flatten(df_raw, titles, pdf_name, fecha_detectada)
+            count(rows=len(df_final))
+    return df_final
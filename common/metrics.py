@@ -0,0 +1,152 @@
+"""
+Instrumentación por etapa de los pipelines.
+
+Cada etapa (apertura del PDF, palabras, tabla, título, fecha, aplanado,
+exportación) se mide con ``stage(...)``: se registra su duración junto con el
+contexto del trabajo (pdf, página, extractor) y los conteos que la etapa
+agregue con ``count(...)``. Los registros salen por el logger "conversor"
+(texto o JSON por línea) y, dentro de ``collect_records()``, se acumulan para
+escribir un archivo de métricas.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger("conversor")
+
+LOG_FORMAT_ENV = "CONVERSOR_LOG_FORMAT"
+LOG_LEVEL_ENV = "CONVERSOR_LOG_LEVEL"
+
+_context = contextvars.ContextVar("metrics_context", default={})
+_current_stage = contextvars.ContextVar("metrics_stage", default=None)
+_collector = contextvars.ContextVar("metrics_collector", default=None)
+
+
+@contextmanager
+def metrics_context(**fields):
+    """Agrega campos (p.ej. pdf, page, extractor) a todos los registros internos."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """Mide una etapa; el registro se puede completar con ``count(...)``."""
+    parent = _current_stage.get()
+    record = {"stage": name, **_context.get(), **fields}
+    if parent is not None:
+        record["parent"] = parent["stage"]
+    token = _current_stage.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        _current_stage.reset(token)
+        emit(record)
+
+
+def count(**fields) -> None:
+    """Agrega conteos (words, rows, cols, ...) a la etapa en curso, si la hay."""
+    record = _current_stage.get()
+    if record is not None:
+        record.update(fields)
+
+
+def emit(record: dict) -> None:
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(record)
+    if logger.isEnabledFor(logging.INFO):
+        details = ", ".join(f"{k}={v}" for k, v in record.items() if k not in ("stage", "duration_ms"))
+        logger.info("⏱️ %s %.1f ms (%s)", record["stage"], record["duration_ms"], details,
+                    extra={"metrics": record})
+
+
+@contextmanager
+def collect_records():
+    """Acumula en una lista los registros emitidos dentro del bloque."""
+    records = []
+    token = _collector.set(records)
+    try:
+        yield records
+    finally:
+        _collector.reset(token)
+
+
+def merge_records(records: list) -> None:
+    """
+    Suma al colector activo registros emitidos en otro proceso (ya logueados
+    allí, así que no se vuelven a loguear).
+    """
+    collector = _collector.get()
+    if collector is not None:
+        collector.extend(records)
+
+
+# ------------------------------------------------------------
+# Salida: logging estructurado y archivo de métricas
+# ------------------------------------------------------------
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro; los de etapa incluyen todos sus campos."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        metrics = getattr(record, "metrics", None)
+        if metrics is not None:
+            payload.update(metrics)
+        else:
+            payload["message"] = record.getMessage()
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(log_format: str | None = None, level: str | None = None) -> None:
+    """
+    Configura el logger "conversor" hacia stderr. Sin argumentos toma el
+    formato y el nivel de las variables de entorno (útil en procesos hijos).
+    """
+    log_format = log_format or os.environ.get(LOG_FORMAT_ENV, "text")
+    level = level or os.environ.get(LOG_LEVEL_ENV, "WARNING")
+    handler = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+
+def write_metrics(records: list, path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(records, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+    return path
+
+
+def append_metrics(records: list, path) -> Path:
+    """Agrega registros como JSON Lines (para procesos de larga duración)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    return path
@@ -0,0 +1,138 @@
+"""
+Índice de páginas: pre-escaneo liviano con PyMuPDF para decidir qué páginas
+de un PDF contienen tablas ASFI o SOAT, antes de correr los extractores pesados
+(pdfplumber) sobre ellas.
+"""
+from numbers import Integral
+from pathlib import Path
+
+from common.pdf_session import PdfSession, use_session
+
+# Tolerancia vertical (pt) para considerar que dos palabras están en la misma línea
+Y_TOLERANCE = 3.0
+
+# Mínimo de reglas horizontales y verticales que se cruzan entre sí para
+# considerar que hay una tabla con reglas (SOAT)
+MIN_RULED_ROWS = 3
+MIN_RULED_COLS = 4
+
+# Tolerancia (pt) para unir segmentos colineales y para contar un cruce
+RULE_TOLERANCE = 1.5
+
+
+def _is_asfi_page(page) -> bool:
+    """Busca en una misma línea los encabezados MN+UFV, ME+MV y TOTAL."""
+    text = page.get_text("text").upper()
+    if not (("MN+UFV" in text or "MNUFV" in text) and ("ME+MV" in text or "MEMV" in text) and "TOTAL" in text):
+        return False
+
+    words = page.get_text("words")
+    mn_tops, me_tops, total_tops = [], [], []
+    for w in words:
+        t = w[4].upper()
+        if "MN" in t and "UFV" in t:
+            mn_tops.append(w[1])
+        elif "ME" in t and "MV" in t:
+            me_tops.append(w[1])
+        elif "TOTAL" in t:
+            total_tops.append(w[1])
+
+    def near(y, tops):
+        return any(abs(y - other) <= Y_TOLERANCE for other in tops)
+
+    return any(near(y, me_tops) and near(y, total_tops) for y in mn_tops)
+
+
+def _rule_segments(page) -> tuple[list, list]:
+    """
+    Segmentos horizontales ``(y, x0, x1)`` y verticales ``(x, y0, y1)`` de los
+    dibujos de la página. Un rectángulo fino cuenta como una sola regla; uno
+    grueso aporta sus cuatro bordes.
+    """
+    horizontal, vertical = [], []
+    for drawing in page.get_drawings():
+        for item in drawing.get("items", []):
+            kind = item[0]
+            if kind == "re":
+                r = item[1]
+                if r.height <= RULE_TOLERANCE:
+                    horizontal.append(((r.y0 + r.y1) / 2, r.x0, r.x1))
+                elif r.width <= RULE_TOLERANCE:
+                    vertical.append(((r.x0 + r.x1) / 2, r.y0, r.y1))
+                else:
+                    horizontal += [(r.y0, r.x0, r.x1), (r.y1, r.x0, r.x1)]
+                    vertical += [(r.x0, r.y0, r.y1), (r.x1, r.y0, r.y1)]
+            elif kind == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1:
+                    horizontal.append((p1.y, min(p1.x, p2.x), max(p1.x, p2.x)))
+                elif abs(p1.x - p2.x) < 1:
+                    vertical.append((p1.x, min(p1.y, p2.y), max(p1.y, p2.y)))
+    return _merge_rules(horizontal), _merge_rules(vertical)
+
+
+def _merge_rules(segments: list) -> list:
+    """Une los segmentos colineales que se tocan o se solapan en reglas continuas."""
+    merged = []
+    for pos, start, end in sorted(segments):
+        if merged:
+            last_pos, last_start, last_end = merged[-1]
+            if abs(pos - last_pos) <= RULE_TOLERANCE and start <= last_end + RULE_TOLERANCE:
+                merged[-1] = (last_pos, last_start, max(last_end, end))
+                continue
+        merged.append((pos, start, end))
+    return merged
+
+
+def _is_ruled_table_page(page) -> bool:
+    """
+    Detecta una grilla con reglas como las tablas SOAT: al menos
+    ``MIN_RULED_ROWS`` reglas horizontales cruzadas por las mismas
+    ``MIN_RULED_COLS`` (o más) reglas verticales, y esas verticales cerradas
+    por la primera y la última horizontal (no sobresalen de la grilla). Las
+    barras de un gráfico terminan a distintas alturas y los recuadros sueltos
+    no comparten cruces, así que no pasan.
+    """
+    horizontal, vertical = _rule_segments(page)
+    tol = RULE_TOLERANCE
+
+    def crossings(rule):
+        y, x0, x1 = rule
+        return frozenset(i for i, (x, y0, y1) in enumerate(vertical)
+                         if x0 - tol <= x <= x1 + tol and y0 - tol <= y <= y1 + tol)
+
+    rows = [(rule[0], cols) for rule in horizontal
+            if len(cols := crossings(rule)) >= MIN_RULED_COLS]
+    for _, cols in rows:
+        ys = [y for y, other in rows if len(cols & other) >= MIN_RULED_COLS]
+        if len(ys) < MIN_RULED_ROWS:
+            continue
+        top, bottom = min(ys), max(ys)
+        closed = [i for i in cols if vertical[i][1] >= top - tol and vertical[i][2] <= bottom + tol]
+        if len(closed) >= MIN_RULED_COLS:
+            return True
+    return False
+
+
+def as_page_list(pages) -> list[int]:
+    """Normaliza una página (int) o varias (lista, tupla, range) a una lista de enteros >= 1."""
+    pages = [pages] if isinstance(pages, Integral) else list(pages)
+    for page in pages:
+        if not isinstance(page, Integral) or page < 1:
+            raise ValueError(f"Número de página inválido: {page!r}")
+    return [int(page) for page in pages]
+
+
+def build_page_index(pdf_path, session: PdfSession | None = None) -> dict[str, list[int]]:
+    """
+    Recorre todas las páginas con PyMuPDF y devuelve las páginas (1-indexadas)
+    candidatas para cada extractor, p.ej. {"ASFI": [4], "SOAT": [7, 8]}.
+    """
+    index = {"ASFI": [], "SOAT": []}
+    with use_session(Path(pdf_path), session) as session:
+        for number, page in enumerate(session.fitz, start=1):
+            if _is_asfi_page(page):
+                index["ASFI"].append(number)
+            if _is_ruled_table_page(page):
+                index["SOAT"].append(number)
+    return index
@@ -0,0 +1,45 @@
+"""
+Conversión en bloque de números en formato boliviano: punto de miles,
+coma decimal y paréntesis para negativos, p.ej. "1.234,56" o "(12,30)".
+"""
+import numpy as np
+import pandas as pd
+
+# Celdas vacías (un guion solo es "sin dato" en los boletines)
+_MISSING = ["", "nan", "none", "-"]
+
+
+def parse_numbers(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convierte una Series, lista o arreglo NumPy de textos a float64.
+
+    Devuelve ``(numeros, invalidos)``: los números (NaN si la celda está vacía
+    o no se pudo convertir) y una máscara booleana con las celdas no vacías
+    que no se pudieron interpretar. Los valores que ya son numéricos se
+    conservan tal cual.
+    """
+    s = values.reset_index(drop=True) if isinstance(values, pd.Series) \
+        else pd.Series(np.asarray(values, dtype=object), dtype=object)
+    numbers = np.full(len(s), np.nan, dtype="float64")
+    invalid = np.zeros(len(s), dtype=bool)
+
+    if pd.api.types.infer_dtype(s, skipna=True) not in ("string", "mixed", "mixed-integer"):
+        numbers[:] = pd.to_numeric(s, errors="coerce")
+        return numbers, invalid
+
+    text = s.str.strip()
+    is_text = text.notna().to_numpy()
+    if not is_text.all():
+        numbers[~is_text] = pd.to_numeric(s[~is_text], errors="coerce")
+
+    text = text[is_text]
+    empty = text.str.lower().isin(_MISSING).to_numpy()
+    text = text.str.replace(r"[^\d\-.,()]", "", regex=True)
+    negative = text.str.match(r"^\(.*\)$")
+    text = text.mask(negative, "-" + text.str[1:-1])
+    text = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    parsed = pd.to_numeric(text, errors="coerce").to_numpy(dtype="float64")
+
+    numbers[is_text] = parsed
+    invalid[is_text] = np.isnan(parsed) & ~empty
+    return numbers, invalid
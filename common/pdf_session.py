@@ -0,0 +1,170 @@
+"""
+Sesión de documento PDF compartida entre extractores.
+
+Abre el archivo una sola vez por trabajo (pdfplumber y/o PyMuPDF, solo cuando
+se piden) y cachea las páginas y las listas de palabras ya extraídas, para que
+título, fecha y tabla no vuelvan a parsear el xref ni los content streams.
+
+Con ``data`` (bytes o un ``mmap`` del archivo) ambos motores leen desde
+memoria: varios procesos que mapean el mismo PDF comparten las páginas del
+caché del sistema operativo en lugar de tener cada uno su copia.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import io
+
+from common.metrics import stage
+
+
+class PdfSession:
+    """Documento PDF abierto con caché de páginas y palabras."""
+
+    def __init__(self, pdf_path, data=None):
+        self.path = Path(pdf_path)
+        self.data = data
+        self._plumber = None
+        self._fitz = None
+        self._plumber_pages = {}
+        self._fitz_pages = {}
+        self._words = {}
+        self._page_data = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --------------------------------------------------------
+    # Documentos (se abren bajo demanda)
+    # --------------------------------------------------------
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            import pdfplumber  # diferido: pdfminer es costoso de importar
+            with stage("open", backend="pdfplumber"):
+                if self.data is None:
+                    self._plumber = pdfplumber.open(self.path)
+                else:
+                    stream = self.data if hasattr(self.data, "read") else io.BytesIO(self.data)
+                    self._plumber = pdfplumber.open(stream)
+        return self._plumber
+
+    @property
+    def fitz(self):
+        if self._fitz is None:
+            import fitz
+            with stage("open", backend="pymupdf"):
+                if self.data is None:
+                    self._fitz = fitz.open(self.path)
+                else:
+                    # memoryview: PyMuPDF lee el buffer sin copiarlo
+                    self._fitz = fitz.open(stream=memoryview(self.data), filetype="pdf")
+        return self._fitz
+
+    @property
+    def page_count(self) -> int:
+        if self._fitz is not None:
+            return len(self._fitz)
+        return len(self.plumber.pages)
+
+    # --------------------------------------------------------
+    # Páginas y palabras cacheadas
+    # --------------------------------------------------------
+    def plumber_page(self, page_number: int):
+        """Página pdfplumber (1-indexada)."""
+        page = self._plumber_pages.get(page_number)
+        if page is None:
+            page = self.plumber.pages[page_number - 1]
+            self._plumber_pages[page_number] = page
+        return page
+
+    def fitz_page(self, page_number: int):
+        """Página PyMuPDF (1-indexada)."""
+        page = self._fitz_pages.get(page_number)
+        if page is None:
+            page = self.fitz[page_number - 1]
+            self._fitz_pages[page_number] = page
+        return page
+
+    def words(self, page_number: int, **kwargs) -> list:
+        """
+        Palabras de la página vía pdfplumber ``extract_words``.
+        Se cachean por página y por combinación de parámetros.
+        """
+        key = (page_number, tuple(sorted(kwargs.items())))
+        words = self._words.get(key)
+        if words is None:
+            words = self.plumber_page(page_number).extract_words(**kwargs)
+            self._words[key] = words
+        return words
+
+    def fitz_words(self, page_number: int, clip: tuple | None = None) -> list:
+        """
+        Palabras de la página vía PyMuPDF ``get_text("words")``, con las mismas
+        claves que pdfplumber (``text``, ``x0``, ``x1``, ``top``, ``bottom``).
+        ``clip`` (x0, y0, x1, y1) limita la extracción a esa región.
+        """
+        key = (page_number, "fitz", clip)
+        words = self._words.get(key)
+        if words is None:
+            words = [
+                {"text": w[4], "x0": float(w[0]), "x1": float(w[2]), "top": float(w[1]), "bottom": float(w[3])}
+                for w in self.fitz_page(page_number).get_text("words", clip=clip)
+            ]
+            self._words[key] = words
+        return words
+
+    def page_data(self, page_number: int, key, compute):
+        """
+        Resultado cacheado de ``compute()`` para la página (p.ej. la grilla
+        cruda de una tabla), así otra etapa puede pedirlo sin recalcularlo.
+        """
+        cache_key = (page_number, key)
+        if cache_key not in self._page_data:
+            self._page_data[cache_key] = compute()
+        return self._page_data[cache_key]
+
+    def release_page(self, page_number: int) -> None:
+        """
+        Libera lo cacheado de una página ya procesada: palabras, objetos de
+        layout de pdfplumber (``Page.close`` vacía ``flush_cache`` y el textmap)
+        y la página de PyMuPDF. Permite recorrer documentos largos con memoria acotada.
+        """
+        for cache in (self._words, self._page_data):
+            for key in [k for k in cache if k[0] == page_number]:
+                del cache[key]
+        page = self._plumber_pages.pop(page_number, None)
+        if page is not None:
+            page.close()
+            # pdfminer guarda cada objeto ya leído (content streams incluidos) en el
+            # documento; se vuelven a leer del archivo si otra página los necesita
+            doc = self._plumber.doc
+            for cache in ("_cached_objs", "_parsed_objs"):
+                getattr(doc, cache, {}).clear()
+        self._fitz_pages.pop(page_number, None)
+
+    def close(self):
+        self._plumber_pages.clear()
+        self._fitz_pages.clear()
+        self._words.clear()
+        self._page_data.clear()
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        if self._fitz is not None:
+            self._fitz.close()
+            self._fitz = None
+
+
+@contextmanager
+def use_session(pdf_path, session: PdfSession | None = None):
+    """
+    Devuelve la sesión recibida o abre una nueva (y la cierra al salir).
+    Permite llamar a los extractores con o sin sesión compartida.
+    """
+    if session is not None:
+        yield session
+        return
+    with PdfSession(pdf_path) as new_session:
+        yield new_session
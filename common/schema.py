@@ -0,0 +1,56 @@
+"""
+Esquema compacto de la tabla larga.
+
+Las etiquetas (archivo, títulos, niveles nv1–nv5) se repiten en cada fila:
+como ``category`` cada texto distinto se guarda una vez y las filas llevan un
+código entero. La fecha es ``datetime64`` y el valor ``float64``; el texto
+original del valor se conserva en una columna aparte solo cuando no se pudo
+convertir a número (en el resto de las filas queda vacía).
+"""
+import pandas as pd
+
+from common.parse_number import parse_numbers
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def label_columns(columns) -> list[str]:
+    """Columnas de etiquetas repetidas: file, titulo1 / title_N y nv1–nv5."""
+    return [c for c in columns
+            if c == "file" or str(c).startswith(("titulo", "title_")) or str(c)[:2] == "nv"]
+
+
+def compact_long_table(df: pd.DataFrame, value_col: str, text_col: str, date_col: str) -> pd.DataFrame:
+    """
+    Devuelve ``df`` con etiquetas categóricas, ``date_col`` como fecha y
+    ``value_col`` como float. ``text_col`` (insertada a continuación del
+    valor) guarda el texto de los valores que no son números.
+    """
+    df = df.copy()
+    numbers, invalid = parse_numbers(df[value_col])
+    raw = df[value_col].astype(str).str.strip().to_numpy(dtype=object)
+    df[value_col] = numbers
+    df.insert(df.columns.get_loc(value_col) + 1, text_col,
+              pd.Series(raw, index=df.index, dtype=object).where(invalid, None))
+    df[date_col] = pd.to_datetime(df[date_col], format=DATE_FORMAT, errors="coerce")
+    for col in label_columns(df.columns):
+        df[col] = df[col].astype("category")
+    return df
+
+
+def concat_compact(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    ``pd.concat`` que mantiene las columnas categóricas: unifica las categorías
+    de cada bloque (si difieren, ``pd.concat`` volvería a ``object``).
+    """
+    categories = {}
+    for chunk in chunks:
+        for col in chunk.columns:
+            if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                seen = categories.setdefault(col, {})
+                seen.update(dict.fromkeys(chunk[col].cat.categories))
+    if categories:
+        chunks = [chunk.assign(**{col: chunk[col].cat.set_categories(list(seen))
+                                  for col, seen in categories.items() if col in chunk.columns})
+                  for chunk in chunks]
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,93 @@
+"""
+Instantáneas de la capa cruda de extracción, para volver a correr las
+heurísticas sin tocar el PDF.
+
+Por página se guarda un ``.npz`` comprimido con lo que entregan los motores
+antes de cualquier heurística: las palabras con coordenadas (ASFI) o la grilla
+cruda de la tabla (SOAT), más los títulos detectados y la metadata en JSON.
+Con ``replay_snapshot`` de cada extractor, un archivo completo se reprocesa en
+segundos tras cambiar, p.ej., la detección de encabezados de sección.
+
+Se activa con la variable de entorno CONVERSOR_SNAPSHOT_DIR (la CLI la fija con
+--snapshot-dir; por convención ``data/snapshots``, junto a ``data/temp``).
+"""
+from pathlib import Path
+import json
+import os
+
+# numpy se importa al guardar / leer: la CLI importa este módulo al arrancar
+SNAPSHOT_DIR_ENV = "CONVERSOR_SNAPSHOT_DIR"
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_dir() -> Path | None:
+    """Carpeta de instantáneas configurada por entorno, o None si está desactivada."""
+    directory = os.environ.get(SNAPSHOT_DIR_ENV)
+    return Path(directory) if directory else None
+
+
+def snapshot_path(directory, pdf_path, page_number: int, extractor: str) -> Path:
+    return Path(directory) / f"{Path(pdf_path).stem}_page{page_number}_{extractor.upper()}.npz"
+
+
+def save_snapshot(pdf_path, page_number: int, extractor: str, arrays: dict, meta: dict,
+                  directory=None) -> Path | None:
+    """
+    Guarda ``arrays`` (arreglos NumPy; el texto se guarda como unicode, sin
+    pickle) y ``meta`` en la carpeta indicada o la del entorno.
+    Devuelve la ruta, o None si las instantáneas están desactivadas.
+    """
+    directory = directory or snapshot_dir()
+    if directory is None:
+        return None
+    path = snapshot_path(directory, pdf_path, page_number, extractor)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf_path = Path(pdf_path)
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "pdf": pdf_path.name,
+        "page": page_number,
+        "extractor": extractor.upper(),
+        "pdf_size": pdf_path.stat().st_size if pdf_path.exists() else None,
+        **meta,
+    }
+    import numpy as np
+    arrays = {k: v.astype(str) if v.dtype == object else v for k, v in arrays.items()}
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_snapshot(path) -> tuple[dict, dict]:
+    """Devuelve ``(arreglos, meta)``; el texto vuelve como arreglos ``object``."""
+    import numpy as np
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Instantánea {Path(path).name}: versión {meta.get('version')} no soportada")
+        arrays = {k: data[k].astype(object) if data[k].dtype.kind == "U" else data[k]
+                  for k in data.files if k != "meta"}
+    return arrays, meta
+
+
+def parse_snapshot_name(path) -> tuple[str, int, str]:
+    """``boletin_page4_ASFI.npz`` → ("boletin", 4, "ASFI")."""
+    stem, _, rest = Path(path).stem.rpartition("_page")
+    page, _, extractor = rest.partition("_")
+    if not stem or not page.isdigit() or not extractor:
+        raise ValueError(f"Nombre de instantánea inválido: {Path(path).name}")
+    return stem, int(page), extractor
+
+
+def find_snapshots(directory, extractor: str | None = None) -> list[Path]:
+    """Instantáneas de la carpeta (opcionalmente de un extractor), ordenadas por archivo y página."""
+    pattern = f"*_{extractor.upper()}.npz" if extractor else "*.npz"
+    keyed = []
+    for path in Path(directory).glob(pattern):
+        try:
+            keyed.append((parse_snapshot_name(path), path))
+        except ValueError:  # otros .npz en la carpeta
+            continue
+    return [path for _, path in sorted(keyed)]
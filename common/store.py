@@ -0,0 +1,149 @@
+"""
+Almacén consolidado en SQLite para las series de boletines.
+
+Cada extractor tiene su tabla (``asfi``, ``soat``) con las columnas de la tabla
+larga más ``page``. Las filas de un boletín se reemplazan por (file, page):
+volver a procesar una página borra sus filas anteriores e inserta las nuevas en
+la misma transacción, así que la base nunca duplica datos. Hay índices sobre
+file/page, la fecha y los niveles nv1–nv4 para consultar series largas sin
+releer Excel.
+
+La base usa WAL para que varios procesos del pool puedan escribir (en turnos)
+mientras otros leen.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+import re
+import sqlite3
+
+from common.export import DATE_COLUMNS, date_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+INDEXED_COLUMNS = ("fecha", "date", "nv1", "nv2", "nv3", "nv4")
+VALUE_COLUMNS = ("valor", "value")
+BUSY_TIMEOUT_SECONDS = 60
+
+
+def _table_name(extractor: str) -> str:
+    name = extractor.lower()
+    if not re.fullmatch(r"[a-z][a-z0-9_]*", name):
+        raise ValueError(f"Nombre de extractor inválido para el almacén: '{extractor}'")
+    return name
+
+
+def _quote(column: str) -> str:
+    return '"' + str(column).replace('"', '""') + '"'
+
+
+def connect(db_path) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _ensure_table(conn: sqlite3.Connection, table: str, columns: list[str]) -> None:
+    """Crea la tabla y sus índices, o agrega las columnas nuevas (p.ej. más títulos SOAT)."""
+    existing = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+    if not existing:
+        defs = ['"page" INTEGER NOT NULL'] + [
+            f"{_quote(c)} {'REAL' if c in VALUE_COLUMNS else 'TEXT'}" for c in columns if c != "page"
+        ]
+        conn.execute(f"CREATE TABLE {_quote(table)} ({', '.join(defs)})")
+        existing = ["page"] + [c for c in columns if c != "page"]
+        conn.execute(f"CREATE INDEX {_quote(f'ix_{table}_file_page')} ON {_quote(table)} (file, page)")
+    else:
+        for c in columns:
+            if c not in existing:
+                conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(c)} "
+                             f"{'REAL' if c in VALUE_COLUMNS else 'TEXT'}")
+                existing.append(c)
+    for c in INDEXED_COLUMNS:
+        if c in existing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'ix_{table}_{c}')} ON {_quote(table)} ({_quote(c)})")
+
+
+def upsert_long_table(db_path, df: pd.DataFrame, extractor: str, page_number: int | None = None) -> int:
+    """
+    Reemplaza en el almacén las filas de (archivo, página) del extractor por
+    las de ``df`` (tabla larga final). Si ``df`` trae la columna ``page``
+    (tabla de varias páginas) se usa la de cada fila; si no, ``page_number``.
+    Devuelve la cantidad de filas escritas.
+    """
+    if "file" not in df.columns:
+        raise ValueError("La tabla larga no tiene la columna 'file'")
+    if "page" not in df.columns and page_number is None:
+        raise ValueError("Falta la página: la tabla no tiene columna 'page' ni se indicó page_number")
+    table = _table_name(extractor)
+    columns = [str(c) for c in df.columns if c != "page"]
+
+    rows = df[columns].astype(object).where(df[columns].notna(), None)
+    for c in DATE_COLUMNS:
+        if c in rows.columns:
+            # Texto 'YYYY-MM-DD': así lo comparan date_from / date_to en load_table
+            rows[c] = date_text(df[c]).replace("", None)
+    rows.insert(0, "page", df["page"].astype(int).to_numpy() if "page" in df.columns else int(page_number))
+    keys = rows[["file", "page"]].dropna().drop_duplicates()
+    placeholders = ", ".join("?" for _ in rows.columns)
+    insert = (f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in rows.columns)}) "
+              f"VALUES ({placeholders})")
+
+    conn = connect(db_path)
+    try:
+        # Una transacción con el bloqueo de escritura tomado desde el inicio:
+        # esquema + borrado + inserción, sin carreras entre procesos del pool
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _ensure_table(conn, table, columns)
+            conn.executemany(f"DELETE FROM {_quote(table)} WHERE file = ? AND page = ?",
+                             [(f, int(p)) for f, p in keys.itertuples(index=False, name=None)])
+            conn.executemany(insert, rows.itertuples(index=False, name=None))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def load_table(db_path, extractor: str, filters: dict | None = None,
+               date_from: str | None = None, date_to: str | None = None) -> pd.DataFrame:
+    """
+    Lee del almacén las filas del extractor. ``filters`` filtra por igualdad
+    (p.ej. ``{"nv1": "DISPONIBILIDADES"}``); ``date_from`` / ``date_to``
+    acotan la fecha en formato YYYY-MM-DD (inclusive).
+    """
+    import pandas as pd
+
+    table = _table_name(extractor)
+    conn = connect(db_path)
+    try:
+        existing = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+        if not existing:
+            return pd.DataFrame()
+        where, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in existing:
+                raise ValueError(f"La tabla '{table}' no tiene la columna '{column}'")
+            where.append(f"{_quote(column)} = ?")
+            params.append(value)
+        date_col = next((c for c in ("fecha", "date") if c in existing), None)
+        if date_col and date_from:
+            where.append(f"{_quote(date_col)} >= ?")
+            params.append(date_from)
+        if date_col and date_to:
+            where.append(f"{_quote(date_col)} <= ?")
+            params.append(date_to)
+        sql = f"SELECT * FROM {_quote(table)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
@@ -2,189 +2,160 @@
 Extractor específico para tablas ASFI - Disponibilidades e Inversiones Temporarias
 Página 4 del PDF "carta informativa"
 """
-import pdfplumber
 import pandas as pd
 import numpy as np
 import re
 from pathlib import Path
+from common.cache import cached_extraction
+from common.export import write_long_table
+from common.parse_number import parse_numbers
+from common.layout import words_to_arrays, group_lines, line_texts, assign_columns, build_grid
+from common.pdf_session import PdfSession, use_session
+from common.metrics import logger, stage, count
 
+# Motores de extracción de palabras disponibles
+WORD_BACKENDS = ("pdfplumber", "pymupdf")
 
-def _clean_text(text: str) -> str:
-    """Limpia texto eliminando espacios extras y caracteres especiales"""
-    if text is None or (isinstance(text, float) and pd.isna(text)):
-        return ""
-    text = str(text).strip()
-    text = re.sub(r'\s+', ' ', text)
-    return text
+# Tolerancia vertical (pt) para agrupar palabras en una misma línea
+LINE_Y_TOLERANCE = 1.0
 
 
-def _parse_number(text) -> float:
-    """Convierte texto a número, manejando formatos con puntos, comas y paréntesis."""
-    if isinstance(text, (pd.Series, list, tuple)):
-        if len(text) > 0:
-            text = text[0]
+def page_words(session: PdfSession, page_number: int, word_backend: str = "pdfplumber") -> list:
+    """Palabras de la página con el motor elegido (cacheadas en la sesión)."""
+    with stage("words", backend=word_backend):
+        if word_backend == "pymupdf":
+            words = session.fitz_words(page_number)
         else:
-            return np.nan
-
-    if text is None:
-        return np.nan
-
-    text = str(text).strip()
-    if text.lower() in ["nan", "none", ""]:
-        return np.nan
-
-    if text.startswith("(") and text.endswith(")"):
-        text = "-" + text[1:-1]
+            words = session.words(
+                page_number,
+                x_tolerance=2,
+                y_tolerance=3,
+                keep_blank_chars=False
+            )
+        count(words=len(words))
+    return words
+
+
+@cached_extraction("asfi_table", version="2")
+def extract_asfi_table(pdf_path: Path, page_number: int, session: PdfSession | None = None,
+                       word_backend: str = "pdfplumber") -> pd.DataFrame:
+    """
+    Extrae la tabla de Disponibilidades e Inversiones Temporarias de ASFI.
+    word_backend: "pdfplumber" (por defecto) o "pymupdf", mucho más rápido en páginas densas.
+    La copia de depuración en ``data/temp`` la escribe ``save_temp_table``.
+    """
+    if word_backend not in WORD_BACKENDS:
+        raise ValueError(f"❌ Motor de palabras '{word_backend}' no reconocido. Usa: {', '.join(WORD_BACKENDS)}")
+    pdf_path = Path(pdf_path)
+    logger.debug(f"📄 Extrayendo tabla ASFI de {pdf_path.name} - Página {page_number}")
+
+    with use_session(pdf_path, session) as session:
+        # Con PyMuPDF se cuentan las páginas con fitz: session.page_count abriría pdfplumber
+        page_count = len(session.fitz) if word_backend == "pymupdf" else session.page_count
+        if page_number > page_count:
+            raise ValueError(f"❌ El PDF solo tiene {page_count} páginas")
+        words = page_words(session, page_number, word_backend)
 
-    text = text.replace(".", "").replace(",", ".")
-    text = re.sub(r"[^\d\-.]", "", text)
+    if not words:
+        raise ValueError("❌ No se pudieron extraer palabras de la página")
 
-    try:
-        return float(text)
-    except ValueError:
-        return np.nan
+    logger.debug(f"   ✓ Extraídas {len(words)} palabras")
+    return asfi_table_from_arrays(words_to_arrays(words))
 
 
-def extract_asfi_table(pdf_path: Path, page_number: int, save_temp: bool = True) -> pd.DataFrame:
+def save_temp_table(df: pd.DataFrame, pdf_path: Path, page_number: int) -> Path:
     """
-    Extrae la tabla de Disponibilidades e Inversiones Temporarias de ASFI
+    Guarda la tabla cruda en ``data/temp`` (junto a la carpeta del PDF) para
+    depurar las heurísticas. Solo se usa a pedido (--save-temp).
     """
-    print(f"📄 Extrayendo tabla ASFI de {pdf_path.name} - Página {page_number}")
+    pdf_path = Path(pdf_path)
+    temp_file = write_long_table(df, pdf_path.parent.parent / "temp" / f"{pdf_path.stem}_page{page_number}_asfi_temp")
+    logger.debug(f"   ✅ Guardado temporal en: {temp_file}")
+    return temp_file
 
-    with pdfplumber.open(pdf_path) as pdf:
-        if page_number > len(pdf.pages):
-            raise ValueError(f"❌ El PDF solo tiene {len(pdf.pages)} páginas")
 
-        page = pdf.pages[page_number - 1]
-        words = page.extract_words(
-            x_tolerance=2,
-            y_tolerance=3,
-            keep_blank_chars=False
-        )
-
-    if not words:
+def asfi_table_from_arrays(w: dict) -> pd.DataFrame:
+    """
+    Heurísticas de la tabla ASFI sobre las palabras ya extraídas (arreglos de
+    ``words_to_arrays``): encabezado, columnas, filas y conversión numérica.
+    """
+    if len(w["text"]) == 0:
         raise ValueError("❌ No se pudieron extraer palabras de la página")
 
-    print(f"   ✓ Extraídas {len(words)} palabras")
-
     # Agrupar por línea
-    lines_dict = {}
-    for w in words:
-        y_pos = round(w["top"], 1)
-        lines_dict.setdefault(y_pos, []).append(w)
-
-    sorted_lines = sorted(lines_dict.items(), key=lambda x: x[0])
-    print(f"   ✓ Agrupadas en {len(sorted_lines)} líneas")
+    line_id = group_lines(w["top"], LINE_Y_TOLERANCE)
+    texts = line_texts(w["text"], line_id, w["x0"])
+    logger.debug(f"   ✓ Agrupadas en {len(texts)} líneas")
 
     # Buscar encabezado
     header_line_idx = None
-    header_words = None
-    for idx, (_, line_words) in enumerate(sorted_lines):
-        line_words_sorted = sorted(line_words, key=lambda w: w["x0"])
-        line_text = " ".join(w["text"].upper() for w in line_words_sorted)
+    for idx, line_text in enumerate(texts):
+        line_text = line_text.upper()
         if "MN+UFV" in line_text or "MNUFV" in line_text:
             if "ME+MV" in line_text or "MEMV" in line_text:
                 if "TOTAL" in line_text:
                     header_line_idx = idx
-                    header_words = line_words_sorted
-                    print(f"   ✓ Encabezado encontrado en línea {idx}")
+                    logger.debug(f"   ✓ Encabezado encontrado en línea {idx}")
                     break
 
     if header_line_idx is None:
         raise ValueError("❌ No se encontró el encabezado esperado (MN+UFV, ME+MV, TOTAL)")
 
     # Posiciones de columnas
+    header_idx = np.flatnonzero(line_id == header_line_idx)
+    header_idx = header_idx[np.argsort(w["x0"][header_idx], kind="stable")]
     col_positions, col_names = [], []
-    for w in header_words:
-        t = w["text"].upper()
+    for t, x in zip(w["text"][header_idx], w["x0"][header_idx]):
+        t = t.upper()
         if "MN" in t and "UFV" in t:
-            col_positions.append(w["x0"])
+            col_positions.append(x)
             col_names.append("MNUFV")
         elif "ME" in t and "MV" in t:
-            col_positions.append(w["x0"])
+            col_positions.append(x)
             col_names.append("MEMV")
         elif "TOTAL" in t and len(t) <= 10:
-            col_positions.append(w["x0"])
+            col_positions.append(x)
             col_names.append("TOTAL")
 
     if len(col_positions) < 3:
         raise ValueError("❌ Se esperaban al menos 3 columnas numéricas")
 
-    print(f"   ✓ Detectadas {len(col_positions)} columnas: {col_names}")
+    logger.debug(f"   ✓ Detectadas {len(col_positions)} columnas: {col_names}")
 
-    # Límites de columnas
-    left_limit = min(w["x0"] for w in words) - 10
+    # Límites de columnas: borde izquierdo de cada una (punto medio con la anterior)
+    col_positions = np.array(col_positions)
+    left_limit = w["x0"].min() - 10
     first_col_limit = (left_limit + col_positions[0]) / 2
-    column_boundaries = []
+    col_lefts = np.concatenate(([first_col_limit], (col_positions[:-1] + col_positions[1:]) / 2))
 
-    for i, x in enumerate(col_positions):
-        if i == 0:
-            column_boundaries.append((first_col_limit, x))
-        else:
-            mid = (col_positions[i - 1] + x) / 2
-            column_boundaries.append((mid, x))
-    right_limit = max(w["x1"] for w in words) + 10
-    column_boundaries.append((col_positions[-1], right_limit))
-
-    print("   ✓ Límites de columnas calculados")
-
-    # Extraer filas
-    data_rows = []
-    for _, line_words in sorted_lines[header_line_idx + 1:]:
-        line_words_sorted = sorted(line_words, key=lambda w: w["x0"])
-        if not line_words_sorted:
-            continue
-
-        line_text = " ".join(w["text"] for w in line_words_sorted).strip()
-        if not line_text or re.match(r"^(NOTA|EN MILLONES|VARIACIÓN|A PARTIR|INCLUYE)", line_text.upper()):
-            continue
-
-        row = [""] * (len(col_names) + 1)
-        concept_parts = []
-
-        for w in line_words_sorted:
-            x, t = w["x0"], _clean_text(w["text"])
-            if not t:
-                continue
-            if x < first_col_limit:
-                concept_parts.append(t)
-            else:
-                assigned = False
-                for col_idx, (left, _) in enumerate(column_boundaries):
-                    if left <= x < left + 100:
-                        # ✅ uso .iloc para evitar FutureWarning
-                        prev = row[col_idx + 1]
-                        row[col_idx + 1] = (prev + " " + t).strip() if prev else t
-                        assigned = True
-                        break
-                if not assigned:
-                    distances = [abs(x - cp) for cp in col_positions]
-                    closest_idx = int(np.argmin(distances))
-                    prev = row[closest_idx + 1]
-                    row[closest_idx + 1] = (prev + " " + t).strip() if prev else t
-
-        row[0] = " ".join(concept_parts).strip()
-        if row[0] or any(row[1:]):
-            data_rows.append(row)
-
-    print(f"   ✓ Procesadas {len(data_rows)} filas de datos")
+    # Extraer filas: líneas bajo el encabezado que no sean notas al pie
+    skip_line = np.array([
+        not t.strip() or bool(re.match(r"^(NOTA|EN MILLONES|VARIACIÓN|A PARTIR|INCLUYE)", t.strip().upper()))
+        for t in texts
+    ])
+    cleaned = pd.Series(w["text"], dtype=object).str.strip().str.replace(r"\s+", " ", regex=True).to_numpy()
+    keep = (line_id > header_line_idx) & ~skip_line[line_id] & (cleaned != "")
 
-    df = pd.DataFrame(data_rows, columns=["CONCEPTO"] + col_names)
+    x = w["x0"][keep]
+    col_id = np.zeros(len(x), dtype=int)
+    in_values = x >= first_col_limit
+    col_id[in_values] = assign_columns(x[in_values], col_lefts, col_positions) + 1
+    _, grid = build_grid(line_id[keep], col_id, x, cleaned[keep], len(col_names) + 1)
+    data_rows = grid.tolist()
 
-    for col in col_names:
-        df[col] = df[col].apply(_parse_number)
+    logger.debug(f"   ✓ Procesadas {len(data_rows)} filas de datos")
 
-    df = df.dropna(how="all", subset=col_names)
-    df = df[~((df["CONCEPTO"] == "") & df[col_names].isna().all(axis=1))]
-    df = df.reset_index(drop=True)
+    df = pd.DataFrame(data_rows, columns=["CONCEPTO"] + col_names)
 
-    print(f"   ✓ DataFrame final: {len(df)} filas × {len(df.columns)} columnas")
+    # Conversión numérica por posición (los nombres de columna pueden repetirse)
+    for pos in range(1, len(df.columns)):
+        df.isetitem(pos, parse_numbers(df.iloc[:, pos])[0])
 
-    if save_temp:
-        temp_dir = pdf_path.parent.parent / "temp"
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        temp_file = temp_dir / f"{pdf_path.stem}_page{page_number}_asfi_temp.xlsx"
-        df.to_excel(temp_file, index=False)
-        print(f"   ✅ Guardado temporal en: {temp_file}")
+    values_missing = df.iloc[:, 1:].isna().all(axis=1)
+    df = df[~values_missing]
+    df = df[~((df["CONCEPTO"] == "") & df.iloc[:, 1:].isna().all(axis=1))]
+    df = df.reset_index(drop=True)
 
+    logger.debug(f"   ✓ DataFrame final: {len(df)} filas × {len(df.columns)} columnas")
+    count(words=len(w["text"]), lines=len(texts), rows=len(df), cols=len(df.columns))
     return df
@@ -1,17 +1,102 @@
-import pdfplumber
+import numpy as np
 import pandas as pd
+from common.cache import cached_extraction
+from common.pdf_session import PdfSession, use_session
+from common.metrics import stage, count
 
+# Motores de detección de la grilla disponibles
+TABLE_BACKENDS = ("pdfplumber", "pymupdf")
 
-def extract_table_from_pdf(pdf_file: str, page_number: int) -> pd.DataFrame:
+# Filas de totales cuyos valores pueden quedar una columna a la izquierda
+SHIFTED_TOTAL_ROWS = r"TOTAL PANDO|TOTAL GENERAL"
+
+
+def _raw_table(session: PdfSession, page_number: int, table_backend: str) -> list | None:
+    """
+    Grilla cruda (lista de filas) de la tabla más grande de la página.
+    Con "pymupdf" usa ``Page.find_tables``; si no encuentra ninguna tabla,
+    vuelve a intentar con pdfplumber.
+    """
+    if table_backend == "pymupdf":
+        with stage("grid", backend="pymupdf"):
+            tables = session.fitz_page(page_number).find_tables().tables
+            count(tables=len(tables))
+        if tables:
+            # Igual que pdfplumber.extract_table: la de más celdas
+            return max(tables, key=lambda t: t.row_count * t.col_count).extract()
+    with stage("grid", backend="pdfplumber"):
+        return session.plumber_page(page_number).extract_table()
+
+
+def _shifted_columns(df: pd.DataFrame) -> np.ndarray:
+    """
+    Columnas ``i`` cuya cabecera (MOTOCICLETA o TOTAL GENERAL, celda combinada)
+    quedó a la izquierda de sus datos: la primera fila de datos está vacía en
+    ``i`` y tiene valor en ``i + 1``.
+    """
+    if len(df) < 2:
+        return np.array([], dtype=int)
+    header = df.iloc[0].str.upper()
+    named = (header.str.contains("MOTOCICLETA", regex=False)
+             | (header.str.contains("TOTAL", regex=False) & header.str.contains("GENERAL", regex=False)))
+    first_row = df.iloc[1].to_numpy(dtype=object)
+    shifted = named.to_numpy()[:-1] & (first_row[:-1] == "") & (first_row[1:] != "")
+    return np.flatnonzero(shifted)
+
+
+def _repair_shifted_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mueve cada cabecera corrida a la columna de sus datos y, en las filas de
+    totales (TOTAL PANDO, TOTAL GENERAL), pasa el valor de ``i`` a ``i + 1``
+    cuando ``i + 1`` está vacía. Las columnas salen de la cabecera, así que
+    sirve para cualquier cantidad de clases de vehículo.
+    """
+    cols = _shifted_columns(df)
+    if not len(cols):
+        return df
+    values = df.to_numpy(dtype=object, copy=True)
+
+    values[0, cols + 1] = values[0, cols]
+    values[0, cols] = ""
+
+    is_total = df.iloc[:, 0].str.upper().str.strip().str.contains(SHIFTED_TOTAL_ROWS).to_numpy()
+    rows = np.flatnonzero(is_total)
+    left, right = np.ix_(rows, cols), np.ix_(rows, cols + 1)
+    move = (values[left] != "") & (values[right] == "")
+    values[right] = np.where(move, values[left], values[right])
+    values[left] = np.where(move, "", values[left])
+
+    return pd.DataFrame(values, index=df.index, columns=df.columns)
+
+
+@cached_extraction("soat_table", version="2")
+def extract_table_from_pdf(pdf_file: str, page_number: int, session: PdfSession | None = None,
+                           table_backend: str = "pdfplumber") -> pd.DataFrame:
     """
     Extrae una tabla desde una página específica de un PDF (caso SOAT).
     Limpia espacios, completa cabeceras y corrige desplazamientos detectados.
     Devuelve un DataFrame con la tabla estructurada.
+    table_backend: "pdfplumber" (por defecto) o "pymupdf" (``find_tables``, más
+    rápido en grillas grandes; si no detecta la tabla se usa pdfplumber).
     """
-    with pdfplumber.open(pdf_file) as pdf:
-        page = pdf.pages[page_number - 1]
-        table = page.extract_table()
+    if table_backend not in TABLE_BACKENDS:
+        raise ValueError(f"❌ Motor de tablas '{table_backend}' no reconocido. Usa: {', '.join(TABLE_BACKENDS)}")
+    with use_session(pdf_file, session) as session:
+        table = raw_grid(session, page_number, table_backend)
+    return soat_table_from_grid(table, page_number)
 
+
+def raw_grid(session: PdfSession, page_number: int, table_backend: str = "pdfplumber") -> list | None:
+    """Grilla cruda de la página, cacheada en la sesión (la pide también la instantánea)."""
+    return session.page_data(page_number, ("grid", table_backend),
+                             lambda: _raw_table(session, page_number, table_backend))
+
+
+def soat_table_from_grid(table: list | None, page_number: int) -> pd.DataFrame:
+    """
+    Heurísticas SOAT sobre la grilla cruda (lista de filas): limpieza,
+    cabeceras corridas y columnas vacías.
+    """
     if not table:
         raise ValueError(f"No se encontró una tabla en la página {page_number}")
 
@@ -29,36 +114,8 @@ def extract_table_from_pdf(pdf_file: str, page_number: int) -> pd.DataFrame:
     # Rellenar primera columna vacía (nombres de departamentos o secciones)
     df.iloc[:, 0] = df.iloc[:, 0].replace("", pd.NA).ffill().fillna("")
 
-    # Ajustar cabeceras incompletas (MOTOCICLETA, TOTAL GENERAL)
-    header_row = df.iloc[0].tolist()
-    for i, header in enumerate(header_row):
-        if not header.strip():
-            continue
-
-        if "MOTOCICLETA" in header.upper() and i + 1 < len(df.columns):
-            if df.iloc[1, i] == "" and df.iloc[1, i + 1] != "":
-                df.iloc[0, i] = ""
-                df.iloc[0, i + 1] = header
-
-        elif ("TOTAL" in header.upper() and "GENERAL" in header.upper()) and i + 1 < len(df.columns):
-            if df.iloc[1, i] == "" and df.iloc[1, i + 1] != "":
-                df.iloc[0, i] = ""
-                df.iloc[0, i + 1] = header
-
-    # Corregir desplazamientos en filas de totales
-    for idx in df.index:
-        first_cell = df.iloc[idx, 0].upper().strip()
-
-        if "TOTAL PANDO" in first_cell or "TOTAL GENERAL" in first_cell:
-            # Corrección en bloque de Motocicleta
-            if len(df.columns) > 5 and df.iloc[idx, 4] and not df.iloc[idx, 5]:
-                df.iloc[idx, 5] = df.iloc[idx, 4]
-                df.iloc[idx, 4] = ""
-
-            # Corrección en bloque de Total General
-            if len(df.columns) > 28 and df.iloc[idx, 27] and not df.iloc[idx, 28]:
-                df.iloc[idx, 28] = df.iloc[idx, 27]
-                df.iloc[idx, 27] = ""
+    # Ajustar cabeceras corridas (MOTOCICLETA, TOTAL GENERAL) y sus filas de totales
+    df = _repair_shifted_columns(df)
 
     # 🔹 NUEVO PASO: eliminar columnas vacías o sin información útil
     df = df.loc[:, (df != "").any(axis=0)]  # elimina columnas completamente vacías
@@ -1,42 +1,63 @@
 
 from pathlib import Path
-import pdfplumber
 import re
+from common.cache import cached_extraction
+from common.layout import words_to_arrays, group_lines, line_texts
+from common.pdf_session import PdfSession, use_session
 
-def extract_asfi_title(pdf_path: Path, page_number: int, max_lines: int = 5) -> str:
+# Regiones (fracción superior de la página) donde buscar el título, de menor a mayor:
+# se amplía solo si en la región no se llega a cerrar el título
+TITLE_REGIONS = (0.25, 0.5, 1.0)
+
+
+def _title_lines(words: list, max_lines: int) -> tuple[list[str], bool]:
+    """
+    Primeras líneas de texto (de arriba hacia abajo) hasta una línea tabular
+    o ``max_lines``. Devuelve ``(lineas, completo)``; ``completo`` es False si
+    las líneas se terminaron antes de cerrar el título.
+    """
+    if not words:
+        return [], False
+
+    # Agrupar por línea según la coordenada Y, de arriba hacia abajo
+    # (dentro de cada línea se respeta el orden del flujo de texto)
+    w = words_to_arrays(words)
+    lines = line_texts(w["text"], group_lines(w["top"]))
+
+    # Tomar las primeras líneas de la parte superior (antes de tablas o números densos)
+    title_lines = []
+    for line_text in lines:
+        line_text = line_text.strip()
+        # Saltar líneas vacías
+        if not line_text:
+            continue
+        # Si detectamos que la línea parece tabular (muchos números), paramos
+        if re.search(r"\d{2,}", line_text) and len(re.findall(r"\d", line_text)) > len(line_text) * 0.3:
+            return title_lines, True
+        # Agregar línea si es corta (típicamente un título)
+        title_lines.append(line_text)
+        if len(title_lines) >= max_lines:
+            return title_lines, True
+    return title_lines, False
+
+
+@cached_extraction("asfi_title", version="3")
+def extract_asfi_title(pdf_path: Path, page_number: int, max_lines: int = 5,
+                       session: PdfSession | None = None) -> str:
     pdf_path = Path(pdf_path)
-    with pdfplumber.open(pdf_path) as pdf:
-        if page_number > len(pdf.pages):
-            raise ValueError(f"❌ El PDF solo tiene {len(pdf.pages)} páginas.")
-        page = pdf.pages[page_number - 1]
-
-        # Extraer texto por líneas con coordenadas
-        words = page.extract_words(use_text_flow=True)
-        if not words:
-            return "TÍTULO NO DETECTADO"
-
-        # Agrupar por línea según la coordenada Y (más pequeña = más arriba)
-        lines_dict = {}
-        for w in words:
-            y = round(w["top"], 1)
-            lines_dict.setdefault(y, []).append(w["text"])
-
-        # Ordenar de arriba hacia abajo
-        sorted_lines = sorted(lines_dict.items(), key=lambda x: x[0])
-
-        # Tomar las primeras líneas de la parte superior (antes de tablas o números densos)
+    with use_session(pdf_path, session) as session:
+        page_count = len(session.fitz)
+        if page_number > page_count:
+            raise ValueError(f"❌ El PDF solo tiene {page_count} páginas.")
+
+        # Extraer palabras solo del encabezado (PyMuPDF con recorte), sin
+        # parsear la tabla que ocupa el resto de la página
+        rect = session.fitz_page(page_number).rect
         title_lines = []
-        for _, parts in sorted_lines:
-            line_text = " ".join(parts).strip()
-            # Saltar líneas vacías
-            if not line_text:
-                continue
-            # Si detectamos que la línea parece tabular (muchos números), paramos
-            if re.search(r"\d{2,}", line_text) and len(re.findall(r"\d", line_text)) > len(line_text) * 0.3:
-                break
-            # Agregar línea si es corta (típicamente un título)
-            title_lines.append(line_text)
-            if len(title_lines) >= max_lines:
+        for fraction in TITLE_REGIONS:
+            clip = None if fraction >= 1 else (rect.x0, rect.y0, rect.x1, rect.y0 + rect.height * fraction)
+            title_lines, complete = _title_lines(session.fitz_words(page_number, clip=clip), max_lines)
+            if complete:
                 break
 
         # Combinar líneas encontradas
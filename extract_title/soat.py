@@ -7,9 +7,20 @@ Cada título es una línea de texto (útil para columnas de Excel: titulo_1, tit
 """
 
 from typing import List
-import fitz
 import re
 import math
+import fitz
+import numpy as np
+from common.layout import group_lines, line_texts
+from common.cache import cached_extraction
+from common.pdf_session import PdfSession, use_session
+
+# Parte superior de la página donde se buscan títulos, y margen extra del
+# recorte para no perder la última línea que empieza dentro de esa parte
+TITLE_REGION = 0.55
+CLIP_MARGIN = 0.10
+# Solo texto: sin bloques de imagen (el "dict" por defecto los incluye con sus bytes)
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
 
 
 def _clean_text(s: str) -> str:
@@ -18,98 +29,104 @@ def _clean_text(s: str) -> str:
     return s
 
 
-def extract_titles(pdf_path: str, page_number: int, max_titles: int = 5) -> List[str]:
+def extract_titles(pdf_path: str, page_number: int, max_titles: int = 5,
+                   session: PdfSession | None = None) -> List[str]:
     """
     Extrae hasta 'max_titles' líneas de título de la parte superior de la página PDF.
     Devuelve una lista ordenada de strings.
     """
     try:
-        doc = fitz.open(pdf_path)
-        if page_number < 1 or page_number > len(doc):
-            raise ValueError(f"El PDF tiene {len(doc)} páginas; pediste la {page_number}.")
-
-        page = doc[page_number - 1]
-        page_dict = page.get_text("dict")
-        blocks = page_dict.get("blocks", [])
-
-        spans = []
-        for b in blocks:
-            for line in b.get("lines", []):
-                for span in line.get("spans", []):
-                    text = _clean_text(span.get("text", ""))
-                    if not text:
-                        continue
-                    if len(re.sub(r"[^\wÁÉÍÓÚÑáéíóúñ]", "", text)) < 3:
-                        continue
-                    size = float(span.get("size", 0))
-                    bbox = span.get("bbox", [0, 0, 0, 0])
-                    spans.append({
-                        "text": text,
-                        "size": size,
-                        "y0": float(bbox[1]),
-                        "x0": float(bbox[0]),
-                    })
-
-        if not spans:
-            raw = page.get_text("text").strip()
-            lines = [l.strip() for l in raw.split("\n") if l.strip()]
-            return lines[:max_titles]
-
-        page_height = page.rect.height
-        top_limit = page_height * 0.55  # considerar parte superior de la página
-        top_spans = [s for s in spans if s["y0"] <= top_limit]
-
-        if not top_spans:
-            top_spans = spans
-
-        # Agrupar spans en líneas según coordenada Y
-        top_spans.sort(key=lambda s: (s["y0"], s["x0"]))
-        lines = []
-        y_tol = 3.0
-        for s in top_spans:
-            if not lines:
-                lines.append([s])
-                continue
-            last = lines[-1][-1]
-            if abs(s["y0"] - last["y0"]) <= y_tol:
-                lines[-1].append(s)
-            else:
-                lines.append([s])
-
-        # Construir texto por línea
-        line_texts = []
-        for ln in lines:
-            ln_sorted = sorted(ln, key=lambda x: x["x0"])
-            full_line = " ".join(t["text"] for t in ln_sorted)
-            if not full_line:
-                continue
-
-            avg_size = sum(s["size"] for s in ln_sorted) / len(ln_sorted)
-            num_ratio = sum(c.isdigit() for c in full_line) / max(1, len(full_line))
-            if num_ratio > 0.25:
-                continue  # probablemente tabla
-            if avg_size < 6:
-                continue  # texto pequeño, no título
-
-            line_texts.append({
-                "y": ln_sorted[0]["y0"],
-                "text": _clean_text(full_line),
-                "score": avg_size + len(full_line) / 10.0,
-            })
-
-        # Ordenar por posición (de arriba a abajo)
-        line_texts.sort(key=lambda x: x["y"])
-
-        # Filtrar duplicados o líneas vacías
-        unique_titles = []
-        for lt in line_texts:
-            if lt["text"] not in unique_titles:
-                unique_titles.append(lt["text"])
-
-        # Limitar a máximo N títulos y pasar a mayúsculas limpias
-        titles = [t.upper() for t in unique_titles[:max_titles]]
-
-        return titles or ["Sin texto detectado"]
-
+        with use_session(pdf_path, session) as session:
+            return _extract_titles(session, page_number, max_titles)
     except Exception as e:
         return [f"⚠️ Error extrayendo títulos: {e}"]
+
+
+def _collect_spans(page, clip=None) -> list[dict]:
+    blocks = page.get_text("dict", clip=clip, flags=TEXT_FLAGS).get("blocks", [])
+    spans = []
+    for b in blocks:
+        for line in b.get("lines", []):
+            for span in line.get("spans", []):
+                text = _clean_text(span.get("text", ""))
+                if not text:
+                    continue
+                if len(re.sub(r"[^\wÁÉÍÓÚÑáéíóúñ]", "", text)) < 3:
+                    continue
+                size = float(span.get("size", 0))
+                bbox = span.get("bbox", [0, 0, 0, 0])
+                spans.append({
+                    "text": text,
+                    "size": size,
+                    "y0": float(bbox[1]),
+                    "x0": float(bbox[0]),
+                })
+    return spans
+
+
+@cached_extraction("soat_titles", version="2")
+def _extract_titles(session: PdfSession, page_number: int, max_titles: int) -> List[str]:
+    doc = session.fitz
+    if page_number < 1 or page_number > len(doc):
+        raise ValueError(f"El PDF tiene {len(doc)} páginas; pediste la {page_number}.")
+
+    page = session.fitz_page(page_number)
+    rect = page.rect
+    top_limit = rect.y0 + rect.height * TITLE_REGION  # considerar parte superior de la página
+
+    # Primero solo el encabezado recortado; la página completa únicamente si ahí no hay texto
+    clip = fitz.Rect(rect.x0, rect.y0, rect.x1, top_limit + rect.height * CLIP_MARGIN)
+    top_spans = [s for s in _collect_spans(page, clip) if s["y0"] <= top_limit]
+
+    if not top_spans:
+        top_spans = _collect_spans(page)
+
+    if not top_spans:
+        raw = page.get_text("text").strip()
+        lines = [l.strip() for l in raw.split("\n") if l.strip()]
+        return lines[:max_titles]
+
+    # Agrupar spans en líneas según coordenada Y
+    text = np.array([s["text"] for s in top_spans], dtype=object)
+    x0 = np.array([s["x0"] for s in top_spans])
+    y0 = np.array([s["y0"] for s in top_spans])
+    size = np.array([s["size"] for s in top_spans])
+    line_id = group_lines(y0, y_tolerance=3.0)
+
+    # Tamaño medio y posición (span más a la izquierda) por línea
+    avg_sizes = np.bincount(line_id, weights=size) / np.bincount(line_id)
+    order = np.lexsort((x0, line_id))
+    first = order[np.flatnonzero(np.concatenate(([True], np.diff(line_id[order]) != 0)))]
+    line_y = y0[first]
+
+    # Construir texto por línea
+    lines = []
+    for full_line, avg_size, y in zip(line_texts(text, line_id, x0), avg_sizes, line_y):
+        if not full_line:
+            continue
+
+        num_ratio = sum(c.isdigit() for c in full_line) / max(1, len(full_line))
+        if num_ratio > 0.25:
+            continue  # probablemente tabla
+        if avg_size < 6:
+            continue  # texto pequeño, no título
+
+        lines.append({
+            "y": y,
+            "text": _clean_text(full_line),
+            "score": avg_size + len(full_line) / 10.0,
+        })
+
+    # Ordenar por posición (de arriba a abajo)
+    lines.sort(key=lambda x: x["y"])
+
+    # Filtrar duplicados o líneas vacías
+    unique_titles = []
+    for lt in lines:
+        if lt["text"] not in unique_titles:
+            unique_titles.append(lt["text"])
+
+    # Limitar a máximo N títulos y pasar a mayúsculas limpias
+    titles = [t.upper() for t in unique_titles[:max_titles]]
+
+    return titles or ["Sin texto detectado"]
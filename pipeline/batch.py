@@ -0,0 +1,304 @@
+"""
+Ejecución por lotes: reparte trabajos (PDF, página) en un pool de procesos.
+
+Cada trabajo abre su propio PDF, genera la tabla larga y escribe la tabla final
+(Excel, Parquet o CSV) y, si se indica, la consolida en el almacén SQLite.
+Un trabajo que falla no detiene al resto; el error queda en su resumen.
+Las métricas por etapa de cada trabajo vuelven al proceso principal en
+``JobResult.metrics``.
+
+En modo streaming cada trabajo es un PDF completo: sus páginas se recorren en
+una sola pasada, liberando cada una al terminarla y escribiendo la salida de
+forma incremental (memoria acotada aunque el documento tenga cientos de páginas).
+
+Con ``combine_workbook`` las salidas de todos los trabajos (escritas en Parquet,
+que es mucho más barato) se juntan después en un solo libro Excel, una hoja
+por trabajo: por página, o por PDF en los modos streaming y por bloques.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from itertools import groupby
+from pathlib import Path
+import signal
+import time
+
+from common.export import LongTableWriter, sheet_name, write_long_table, write_workbook
+from common.pdf_session import PdfSession
+from common.store import upsert_long_table
+from common.metrics import collect_records, configure_logging, count, metrics_context, stage
+from pipeline.registry import get_module, get_processor
+
+
+@dataclass
+class JobResult:
+    pdf: str
+    page: int
+    extractor: str
+    ok: bool
+    rows: int = 0
+    seconds: float = 0.0
+    output: str = ""
+    error: str = ""
+    metrics: list = field(default_factory=list)
+    pages: str = ""  # trabajos de varias páginas (streaming), p.ej. "1-3,7"
+    # Trabajos de varias páginas: las que fallaron, con su error (el resto sí se escribió)
+    page_errors: list = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        """Correcto y sin páginas con error."""
+        return self.ok and not self.page_errors
+
+
+def output_base_for(pdf_path: Path, page_number: int | None, extractor: str, output_dir: Path) -> Path:
+    """Ruta de salida sin extensión (la pone el formato elegido); sin página para documentos completos."""
+    if page_number is None:
+        return output_dir / f"{pdf_path.stem}_{extractor}_final"
+    return output_dir / f"{pdf_path.stem}_page{page_number}_{extractor}_final"
+
+
+def format_pages(pages: list[int]) -> str:
+    """Inversa de ``parse_pages``: [1, 2, 3, 7] → "1-3,7"."""
+    parts = []
+    for _, run in groupby(enumerate(sorted(pages)), key=lambda item: item[1] - item[0]):
+        run = [page for _, page in run]
+        parts.append(str(run[0]) if len(run) == 1 else f"{run[0]}-{run[-1]}")
+    return ",".join(parts)
+
+
+def parse_pages(spec: str) -> list[int]:
+    """
+    Convierte una especificación tipo "4,7-9" en [4, 7, 8, 9].
+    """
+    pages = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+            if start < 1 or end < start:
+                raise ValueError(f"Rango de páginas inválido: '{part}'")
+            pages.extend(range(start, end + 1))
+        else:
+            page = int(part)
+            if page < 1:
+                raise ValueError(f"Número de página inválido: '{part}'")
+            pages.append(page)
+    return sorted(set(pages))
+
+
+def process_page(pdf_path, page_number: int, extractor: str, **options):
+    """options: parámetros propios del extractor (p.ej. word_backend en ASFI)."""
+    extractor = extractor.upper()
+    return get_processor(extractor)(str(pdf_path), page_number, extractor, **options)
+
+
+def preload_extractors(extractors) -> None:
+    """
+    Importa los extractores antes de crear un pool de procesos. Con fork, los
+    procesos heredan del principal los módulos ya importados (pandas, los
+    motores de PDF) y también el entorno: por eso la caché y las instantáneas
+    se activan con variables de entorno (CONVERSOR_CACHE_DIR,
+    CONVERSOR_SNAPSHOT_DIR) y no con parámetros de cada trabajo.
+    """
+    for extractor in extractors:
+        get_processor(extractor)
+
+
+def init_worker() -> None:
+    """Inicializador de los pools de larga vida (vigilancia, servidor)."""
+    # Ctrl+C lo maneja el proceso principal, que cierra el pool ordenadamente;
+    # SIGTERM vuelve al comportamiento por defecto (no heredar el del modo vigilancia)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    configure_logging()
+
+
+def track_job(result: JobResult, work, job_labels: dict | None = None, **labels) -> JobResult:
+    """
+    Corre ``work()`` (que devuelve la ruta de salida y las filas) dentro de la
+    etapa "job", junta sus métricas y completa ``result`` (tiempo, filas, salida
+    o error). ``labels`` van al contexto de métricas. Nunca lanza excepciones.
+    """
+    start = time.perf_counter()
+    with collect_records() as records, \
+            metrics_context(pdf=result.pdf, extractor=result.extractor, **labels):
+        try:
+            with stage("job", **(job_labels or {})):
+                output_file, rows = work()
+                count(rows=rows)
+            result.ok = True
+            result.rows = rows
+            result.output = str(output_file)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+    result.seconds = time.perf_counter() - start
+    result.metrics = records
+    return result
+
+
+def write_final(df_final, output_base: Path, output_format: str, extractor: str,
+                store: Path | None = None, page_number: int | None = None) -> tuple[Path, int]:
+    """Exporta la tabla final y, si se indica, la consolida en ``store``. Devuelve (ruta, filas)."""
+    with stage("export", format=output_format):
+        output_file = write_long_table(df_final, output_base, output_format)
+        count(rows=len(df_final))
+    if store:
+        with stage("store"):
+            count(rows=upsert_long_table(store, df_final, extractor, page_number))
+    return output_file, len(df_final)
+
+
+def run_job(pdf_path: Path, page_number: int, extractor: str, output_dir: Path,
+            output_format: str = "excel", options: dict | None = None,
+            store: Path | None = None, session: PdfSession | None = None) -> JobResult:
+    """
+    Procesa una página y escribe su tabla final (y la consolida en ``store``
+    si se indica). ``session`` permite reutilizar el documento ya abierto.
+    Nunca lanza excepciones.
+    """
+    def work():
+        df_final = process_page(pdf_path, page_number, extractor, session=session, **(options or {}))
+        return write_final(df_final, output_base_for(Path(pdf_path), page_number, extractor, output_dir),
+                           output_format, extractor, store, page_number)
+
+    result = JobResult(pdf=Path(pdf_path).name, page=page_number, extractor=extractor, ok=False)
+    return track_job(result, work, page=page_number)
+
+
+def check_page_errors(pages: list[int], errors: list) -> None:
+    """Falla si no quedó ninguna página: un documento sin tablas no es una salida válida."""
+    if errors and len(errors) == len(pages):
+        raise ValueError(f"Ninguna página se pudo procesar ({format_page_errors(errors)})")
+
+
+def format_page_errors(errors: list) -> str:
+    return "; ".join(f"p{page}: {error}" for page, error in errors)
+
+
+def stream_document(pdf_path, pages: list[int], extractor: str, output_base: Path,
+                    output_format: str = "excel", options: dict | None = None,
+                    store: Path | None = None, errors: list | None = None) -> tuple[Path, int]:
+    """
+    Recorre ``pages`` en una sola pasada y escribe cada página apenas termina
+    (con su columna ``page``). Devuelve la ruta de salida y las filas escritas.
+    Las páginas que fallan se anotan en ``errors`` y no frenan al resto; si
+    fallan todas, no queda archivo de salida.
+    """
+    module = get_module(extractor)
+    errors = [] if errors is None else errors
+    with LongTableWriter(output_base, output_format, getattr(module, "LONG_COLUMNS", None)) as writer:
+        for chunk in module.iter_long_format(pdf_path, pages, errors=errors, **(options or {})):
+            with stage("export", format=output_format):
+                writer.write(chunk)
+                count(rows=len(chunk))
+            if store:
+                with stage("store"):
+                    count(rows=upsert_long_table(store, chunk, extractor))
+        check_page_errors(pages, errors)
+    return writer.path, writer.rows
+
+
+def run_stream_job(pdf_path: Path, pages: list[int], extractor: str, output_dir: Path,
+                   output_format: str = "excel", options: dict | None = None,
+                   store: Path | None = None) -> JobResult:
+    """Como ``run_job`` pero para todas las ``pages`` de un PDF en modo streaming."""
+    def work():
+        return stream_document(pdf_path, pages, extractor,
+                               output_base_for(Path(pdf_path), None, extractor, output_dir),
+                               output_format, options, store, result.page_errors)
+
+    result = JobResult(pdf=Path(pdf_path).name, page=min(pages), extractor=extractor, ok=False,
+                       pages=format_pages(pages))
+    return track_job(result, work, {"pages": result.pages})
+
+
+def run_batch(jobs: list[tuple[Path, int]], extractor: str, output_dir: Path,
+              workers: int | None = None, output_format: str = "excel",
+              options: dict | None = None, store: Path | None = None,
+              stream: bool = False) -> list[JobResult]:
+    """
+    Ejecuta los trabajos (pdf, página) en un pool de procesos.
+    Con ``stream`` se agrupan por PDF y cada PDF es un trabajo de streaming.
+    Devuelve los resultados ordenados por archivo y página.
+    """
+    if stream:
+        tasks = [(run_stream_job, (pdf_path, [page for _, page in pdf_jobs], extractor, output_dir,
+                                   output_format, options, store))
+                 for pdf_path, pdf_jobs in groupby(jobs, key=lambda job: job[0])]
+    else:
+        tasks = [(run_job, (pdf_path, page_number, extractor, output_dir, output_format, options, store))
+                 for pdf_path, page_number in jobs]
+
+    results = []
+    if workers == 1 and not stream:
+        # En serie, un único documento abierto para todas las páginas de cada PDF
+        for pdf_path, pdf_jobs in groupby(jobs, key=lambda job: job[0]):
+            with PdfSession(pdf_path) as session:
+                for _, page_number in pdf_jobs:
+                    results.append(run_job(pdf_path, page_number, extractor, output_dir, output_format,
+                                           options, store, session))
+    elif workers == 1:
+        results = [func(*args) for func, args in tasks]
+    else:
+        preload_extractors([extractor])
+        # configure_logging sin argumentos lee el formato y nivel del entorno
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_logging) as pool:
+            futures = {pool.submit(func, *args): (args[0], args[1]) for func, args in tasks}
+            for future in as_completed(futures):
+                pdf_path, pages = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:  # p.ej. el proceso hijo murió
+                    results.append(JobResult(
+                        pdf=Path(pdf_path).name, page=min(pages) if stream else pages, extractor=extractor,
+                        ok=False, error=f"{type(e).__name__}: {e}", pages=format_pages(pages) if stream else ""
+                    ))
+    results.sort(key=lambda r: (r.pdf, r.page))
+    return results
+
+
+def combine_workbook(results: list[JobResult], workbook: Path) -> Path | None:
+    """
+    Junta las salidas de los trabajos correctos en un libro Excel (una hoja
+    por trabajo, leída recién al escribirla) y apunta cada resultado a su hoja.
+    Devuelve None si no hubo salidas que juntar.
+    """
+    import pandas as pd
+
+    done = [r for r in results if r.ok and r.output]
+    if not done:
+        return None
+    names = []
+
+    def sheets():
+        for r in done:
+            names.append(sheet_name(f"{Path(r.pdf).stem}_p{r.pages or r.page}", names))
+            yield names[-1], pd.read_parquet(r.output)
+
+    with stage("export", format="workbook", sheets=len(done)):
+        path = write_workbook(sheets(), workbook)
+    for r, name in zip(done, names):
+        r.output = f"{path} [{name}]"
+    return path
+
+
+def format_result(r: JobResult) -> str:
+    pages = r.pages or r.page
+    if r.ok and r.page_errors:
+        return (f"⚠️ {r.pdf} p{pages} [{r.extractor}] {r.rows} filas en {r.seconds:.1f}s → {r.output}"
+                f" (páginas con error: {format_page_errors(r.page_errors)})")
+    if r.ok:
+        return f"✅ {r.pdf} p{pages} [{r.extractor}] {r.rows} filas en {r.seconds:.1f}s → {r.output}"
+    return f"❌ {r.pdf} p{pages} [{r.extractor}] {r.error}"
+
+
+def print_summary(results: list[JobResult]) -> None:
+    ok = sum(r.complete for r in results)
+    partial = sum(r.ok and not r.complete for r in results)
+    print(f"\n📋 Resumen: {len(results)} trabajos — {ok} correctos, "
+          + (f"{partial} con páginas fallidas, " if partial else "")
+          + f"{len(results) - ok - partial} con error")
+    for r in results:
+        print(f"  {format_result(r)}")
@@ -0,0 +1,88 @@
+"""
+Registro de extractores: cada tipo de boletín apunta a su función
+``process_pdf_to_long_format`` como texto "modulo:funcion", y el módulo se
+importa recién cuando se elige el extractor. Así la CLI arranca sin cargar
+pandas, pdfplumber ni PyMuPDF, y cada proceso paga solo el backend que usa.
+
+Para agregar un boletín nuevo basta con ``register_extractor("NUEVO", "build_table.nuevo:process_pdf_to_long_format")``
+o con sumarlo a ``EXTRACTORS``.
+"""
+from importlib import import_module
+import sys
+import time
+
+EXTRACTORS = {
+    "ASFI": "build_table.asfi:process_pdf_to_long_format",
+    "SOAT": "build_table.soat:process_pdf_to_long_format",
+}
+
+# Módulos pesados que interesa ver en el perfil de importación
+HEAVY_MODULES = ("pandas", "numpy", "pdfplumber", "fitz", "openpyxl", "pyarrow")
+
+_loaded = {}
+
+
+def register_extractor(name: str, target: str) -> None:
+    """Registra (o reemplaza) un extractor como "modulo:funcion"."""
+    if ":" not in target:
+        raise ValueError(f"Destino '{target}' inválido; se espera 'modulo:funcion'")
+    name = name.upper()
+    EXTRACTORS[name] = target
+    _loaded.pop(name, None)
+
+
+def available_extractors() -> list[str]:
+    return list(EXTRACTORS)
+
+
+def get_module(name: str):
+    """Módulo del extractor ``name`` (p.ej. para ``iter_long_format``, ``concat_pages`` y ``LONG_COLUMNS``)."""
+    name = name.upper()
+    if name not in EXTRACTORS:
+        raise ValueError(f"Extractor '{name}' no reconocido. Usa: {' / '.join(EXTRACTORS)}")
+    return import_module(EXTRACTORS[name].split(":", 1)[0])
+
+
+def get_processor(name: str):
+    """Importa (una sola vez) y devuelve la función del extractor ``name``."""
+    name = name.upper()
+    processor = _loaded.get(name)
+    if processor is None:
+        func_name = EXTRACTORS[name].split(":", 1)[1]
+        processor = getattr(get_module(name), func_name)
+        _loaded[name] = processor
+    return processor
+
+
+# ------------------------------------------------------------
+# Perfil de importación
+# ------------------------------------------------------------
+def loaded_heavy_modules() -> list[str]:
+    return [m for m in HEAVY_MODULES if m in sys.modules]
+
+
+def import_profile(names=None) -> list[dict]:
+    """
+    Mide cuánto tarda en importarse cada extractor (en orden, así que los
+    módulos compartidos se cargan en el primero) y qué módulos pesados quedan
+    cargados después de cada uno.
+    """
+    rows = []
+    for name in names or available_extractors():
+        before = len(sys.modules)
+        start = time.perf_counter()
+        get_processor(name)
+        rows.append({
+            "name": name.upper(),
+            "seconds": time.perf_counter() - start,
+            "new_modules": len(sys.modules) - before,
+            "heavy": loaded_heavy_modules(),
+        })
+    return rows
+
+
+def print_import_profile(rows: list[dict]) -> None:
+    print("\n📦 Perfil de importación")
+    for row in rows:
+        print(f"   {row['name']:<14} {row['seconds'] * 1000:9.1f} ms  "
+              f"(+{row['new_modules']} módulos; cargados: {', '.join(row['heavy']) or '—'})")
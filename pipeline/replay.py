@@ -0,0 +1,31 @@
+"""
+Reprocesamiento desde instantáneas: vuelve a correr las heurísticas de cada
+extractor sobre la capa cruda guardada (ver ``common.snapshot``) sin abrir
+los PDF, y escribe las mismas salidas que el modo por lotes.
+"""
+from pathlib import Path
+
+from common.snapshot import find_snapshots, parse_snapshot_name
+from pipeline.batch import JobResult, output_base_for, track_job, write_final
+from pipeline.registry import get_module
+
+
+def replay_job(snapshot_file: Path, output_dir: Path, output_format: str = "excel",
+               store: Path | None = None) -> JobResult:
+    """Como ``run_job`` pero desde una instantánea. Nunca lanza excepciones."""
+    stem, page_number, extractor = parse_snapshot_name(snapshot_file)
+    result = JobResult(pdf=f"{stem}.pdf", page=page_number, extractor=extractor, ok=False)
+
+    def work():
+        df_final = get_module(extractor).replay_snapshot(snapshot_file)
+        return write_final(df_final, output_base_for(Path(result.pdf), page_number, extractor, output_dir),
+                           output_format, extractor, store, page_number)
+
+    return track_job(result, work, {"source": "snapshot"}, page=page_number)
+
+
+def run_replay(snapshot_dir: Path, output_dir: Path, extractor: str | None = None,
+               output_format: str = "excel", store: Path | None = None) -> list[JobResult]:
+    """Reprocesa todas las instantáneas de la carpeta (o solo las de ``extractor``)."""
+    return [replay_job(path, output_dir, output_format, store)
+            for path in find_snapshots(snapshot_dir, extractor)]
@@ -0,0 +1,317 @@
+"""
+Servidor local de conversión: mantiene los extractores cargados entre pedidos.
+
+Cada ``python src/main.py`` paga el arranque de Python, pandas, pdfminer y
+PyMuPDF antes de convertir nada; para otras herramientas que piden una página
+a la vez ese arranque domina la latencia. Este modo (``--serve``) importa los
+extractores una sola vez, antes de crear su pool de procesos.
+
+- ``POST /convert`` con JSON ``{"pdf": ruta, "pages": 4 | [4, 5] | "4,7-9",
+  "extractor": "ASFI", "output": "rows" | "file", "output_format": "parquet"}``.
+  Con ``"rows"`` (por defecto) responde las filas de la tabla larga; con
+  ``"file"`` escribe la tabla final en la carpeta de salida y responde su ruta.
+  ``"options"`` acepta solo las de ``client_options`` (el motor de cada
+  extractor); cualquier otra responde 400.
+- ``GET /health``: extractores disponibles y trabajos en curso.
+- Como mucho ``workers`` conversiones en paralelo; hasta ``max_queue`` pedidos
+  (en curso + en espera). Con la cola llena responde 503 y ``Retry-After``.
+  Un pedido que agota el tiempo sigue ocupando su lugar hasta que su proceso
+  termina. Si un proceso del pool muere, el pedido responde 503 y el pool se
+  vuelve a crear.
+
+Ejemplo::
+
+    python src/main.py --serve --port 8765 --workers 2
+    curl -s localhost:8765/convert -d '{"pdf": "data/input/boletin.pdf", "pages": 4, "extractor": "ASFI"}'
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from numbers import Integral
+from pathlib import Path
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from common.export import OUTPUT_FORMATS
+from common.metrics import collect_records, logger, metrics_context, stage
+from pipeline.batch import (format_pages, init_worker, parse_pages, preload_extractors, process_page, run_job,
+                            run_stream_job)
+from pipeline.registry import available_extractors
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_TIMEOUT_SECONDS = 300
+MAX_BODY_BYTES = 64 * 1024
+
+
+class BadRequest(ValueError):
+    """Pedido inválido (responde 400 / 404 según ``status``)."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _worker_pid(_=None) -> int:
+    return os.getpid()
+
+
+def client_options(extractor: str) -> dict[str, tuple]:
+    """
+    Opciones que un cliente puede pedir para ``extractor``, con sus valores
+    válidos: solo el motor. El resto (p.ej. save_temp, que escribe en disco)
+    se fija al arrancar el servidor.
+    """
+    # En diferido: request_conversion (el cliente) no necesita los extractores
+    from extract_table.asfi import WORD_BACKENDS
+    from extract_table.soat import TABLE_BACKENDS
+    return {"ASFI": {"word_backend": WORD_BACKENDS},
+            "SOAT": {"table_backend": TABLE_BACKENDS}}.get(extractor, {})
+
+
+def _parse_request(body: dict) -> dict:
+    """Valida el JSON de ``/convert`` y lo normaliza."""
+    if not isinstance(body, dict):
+        raise BadRequest("Se espera un objeto JSON")
+    pdf = Path(str(body.get("pdf") or ""))
+    if not body.get("pdf") or pdf.suffix.lower() != ".pdf":
+        raise BadRequest("Falta 'pdf' o no es un archivo .pdf")
+    if not pdf.is_file():
+        raise BadRequest(f"No existe el PDF: {pdf}", status=404)
+
+    extractor = str(body.get("extractor") or "").upper()
+    if extractor not in available_extractors():
+        raise BadRequest(f"Extractor '{extractor}' no reconocido. Usa: {' / '.join(available_extractors())}")
+
+    pages = body.get("pages")
+    try:
+        if isinstance(pages, Integral) and not isinstance(pages, bool):
+            pages = parse_pages(str(pages))
+        elif isinstance(pages, str):
+            pages = parse_pages(pages)
+        elif isinstance(pages, list):
+            pages = parse_pages(",".join(str(int(p)) for p in pages))
+        else:
+            raise ValueError("se espera un número, una lista o un texto como '4,7-9'")
+    except ValueError as e:
+        raise BadRequest(f"'pages' inválido: {e}")
+    if not pages:
+        raise BadRequest("'pages' no contiene ninguna página")
+
+    output = body.get("output", "rows")
+    if output not in ("rows", "file"):
+        raise BadRequest("'output' debe ser 'rows' o 'file'")
+    output_format = body.get("output_format")
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        raise BadRequest(f"'output_format' debe ser uno de: {', '.join(OUTPUT_FORMATS)}")
+    options = body.get("options") or {}
+    if not isinstance(options, dict):
+        raise BadRequest("'options' debe ser un objeto")
+    allowed = client_options(extractor)
+    for key, value in options.items():
+        if key not in allowed:
+            raise BadRequest(f"Opción '{key}' no permitida para {extractor}. Usa: {', '.join(allowed) or 'ninguna'}")
+        if value not in allowed[key]:
+            raise BadRequest(f"'{key}' debe ser uno de: {', '.join(allowed[key])}")
+
+    return {"pdf": pdf.resolve(), "pages": pages, "extractor": extractor, "output": output,
+            "output_format": output_format, "options": options}
+
+
+def convert(request: dict, output_dir: Path, output_format: str = "excel",
+            default_options: dict | None = None) -> dict:
+    """
+    Ejecuta un pedido ya validado (en un proceso del pool). Nunca lanza
+    excepciones: los errores vuelven en ``{"ok": False, "error": ...}``.
+    """
+    pdf, pages, extractor = request["pdf"], request["pages"], request["extractor"]
+    options = {**(default_options or {}).get(extractor, {}), **request["options"]}
+    output_format = request["output_format"] or output_format
+
+    if request["output"] == "file":
+        if len(pages) == 1:
+            result = run_job(pdf, pages[0], extractor, output_dir, output_format, options)
+        else:
+            result = run_stream_job(pdf, pages, extractor, output_dir, output_format, options)
+        return asdict(result)
+
+    start = time.perf_counter()
+    response = {"pdf": pdf.name, "pages": format_pages(pages), "extractor": extractor, "ok": False}
+    with collect_records() as records, metrics_context(pdf=pdf.name, extractor=extractor):
+        try:
+            with stage("job", pages=response["pages"]):
+                df = process_page(pdf, pages[0] if len(pages) == 1 else pages, extractor, **options)
+            # to_json convierte NaN, fechas y tipos numpy a JSON estándar
+            response["rows"] = json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False))
+            response["columns"] = [str(c) for c in df.columns]
+            response["ok"] = True
+        except Exception as e:
+            response["error"] = f"{type(e).__name__}: {e}"
+    response["seconds"] = time.perf_counter() - start
+    response["metrics"] = records
+    return response
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """Servidor HTTP con un pool de procesos precargado y una cola acotada."""
+
+    daemon_threads = True
+
+    def __init__(self, address, output_dir: Path, workers: int | None = None,
+                 max_queue: int = DEFAULT_MAX_QUEUE, output_format: str = "excel",
+                 options: dict[str, dict] | None = None, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        self.output_dir = Path(output_dir)
+        self.output_format = output_format
+        self.options = options or {}
+        self.job_timeout = timeout
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max(max_queue, self.workers)
+        self.slots = threading.BoundedSemaphore(self.max_queue)
+        self.active = 0
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+
+        preload_extractors(available_extractors())
+        import pdfplumber, fitz  # noqa: F401  (PdfSession los importa en diferido)
+        self.pool = self._new_pool()
+        super().__init__(address, ConversionHandler)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        # Crear todos los procesos ahora (al arrancar, antes de que existan hilos de pedidos)
+        list(pool.map(_worker_pid, range(self.workers)))
+        return pool
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Reemplaza el pool si sigue siendo ``broken`` (otro hilo pudo haberlo hecho ya)."""
+        with self._pool_lock:
+            if self.pool is not broken:
+                return
+            logger.warning("⚠️ Un proceso de conversión terminó inesperadamente; se recrea el pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self.active -= 1
+        self.slots.release()
+
+    def submit(self, request: dict) -> dict | None:
+        """
+        Encola el pedido y espera el resultado; None si la cola está llena.
+        El lugar en la cola se libera cuando el trabajo termina de verdad,
+        no cuando se deja de esperarlo.
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            self.active += 1
+        with self._pool_lock:
+            pool = self.pool
+        try:
+            future = pool.submit(convert, request, self.output_dir, self.output_format, self.options)
+        except BaseException as e:
+            self._release()
+            if not isinstance(e, BrokenProcessPool):
+                raise
+            self._restart_pool(pool)
+            return {"ok": False, "error": "Pool de conversión reiniciado, reintenta", "status": 503}
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.job_timeout)
+        except FutureTimeout:
+            future.cancel()  # solo si aún no empezó; si no, sigue ocupando un proceso y su lugar
+            return {"ok": False, "error": f"Tiempo de espera agotado ({self.job_timeout:g}s)", "status": 504}
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            return {"ok": False, "error": "El proceso de conversión terminó inesperadamente", "status": 503}
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    server: ConversionServer
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            return self._send(404, {"ok": False, "error": "Ruta no encontrada"})
+        self._send(200, {"ok": True, "extractors": available_extractors(), "workers": self.server.workers,
+                         "active": self.server.active, "max_queue": self.server.max_queue})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/convert":
+            return self._send(404, {"ok": False, "error": "Ruta no encontrada"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise BadRequest("Pedido demasiado grande", status=413)
+            request = _parse_request(json.loads(self.rfile.read(length) or b"null"))
+        except BadRequest as e:
+            return self._send(e.status, {"ok": False, "error": str(e)})
+        except ValueError as e:
+            return self._send(400, {"ok": False, "error": f"JSON inválido: {e}"})
+
+        result = self.server.submit(request)
+        if result is None:
+            return self._send(503, {"ok": False, "error": "Cola llena, reintenta más tarde"},
+                              headers={"Retry-After": "1"})
+        status = result.pop("status", None) or (200 if result.get("ok") else 422)
+        self._send(status, result, headers={"Retry-After": "1"} if status == 503 else None)
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("🌐 %s - %s", self.address_string(), format % args)
+
+
+def serve(output_dir: Path, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          workers: int | None = None, max_queue: int = DEFAULT_MAX_QUEUE,
+          output_format: str = "excel", options: dict[str, dict] | None = None,
+          timeout: float = DEFAULT_TIMEOUT_SECONDS) -> None:
+    """Atiende pedidos hasta Ctrl+C."""
+    server = ConversionServer((host, port), output_dir, workers, max_queue, output_format, options, timeout)
+    print(f"🌐 Servidor de conversión en http://{host}:{server.server_address[1]} "
+          f"({server.workers} procesos, cola de {server.max_queue}; Ctrl+C para salir)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Deteniendo servidor...")
+    finally:
+        server.server_close()
+
+
+# ------------------------------------------------------------
+# Cliente
+# ------------------------------------------------------------
+def request_conversion(pdf, pages, extractor: str, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+                       output: str = "rows", output_format: str | None = None,
+                       options: dict | None = None, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> dict:
+    """
+    Envía un pedido a un servidor en marcha y devuelve su respuesta JSON
+    (también en errores HTTP, que traen ``ok: False`` y ``error``).
+    """
+    payload = {"pdf": str(Path(pdf).resolve()), "pages": pages, "extractor": extractor, "output": output,
+               "output_format": output_format, "options": options or {}}
+    req = urllib.request.Request(url.rstrip("/") + "/convert", data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b"{}") | {"status": e.code}
@@ -0,0 +1,100 @@
+"""
+Un solo PDF repartido entre procesos: baja la latencia de un boletín urgente.
+
+- Las páginas se dividen en bloques contiguos de tamaño parejo, uno por proceso.
+- Cada proceso mapea el archivo en memoria (``mmap``: el caché de páginas del
+  sistema operativo es compartido, nadie tiene su propia copia) y recorre su
+  bloque con ``iter_long_format`` sobre su propia sesión.
+- El proceso principal une las tablas en orden de página, así que el resultado
+  es el mismo con cualquier cantidad de procesos, e igual al de
+  ``process_pdf_to_long_format`` con la lista de páginas.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import mmap
+
+from common.metrics import collect_records, configure_logging, merge_records, metrics_context
+from common.page_index import as_page_list
+from common.pdf_session import PdfSession
+from pipeline.batch import (JobResult, check_page_errors, format_pages, output_base_for, preload_extractors,
+                            track_job, write_final)
+from pipeline.registry import get_module
+
+
+def split_pages(pages: list[int], shards: int) -> list[list[int]]:
+    """Divide ``pages`` en hasta ``shards`` bloques contiguos: [1..7], 3 → [1,2,3] [4,5] [6,7]."""
+    if not pages:
+        return []
+    shards = max(1, min(shards, len(pages)))
+    size, extra = divmod(len(pages), shards)
+    blocks, start = [], 0
+    for i in range(shards):
+        end = start + size + (i < extra)
+        blocks.append(pages[start:end])
+        start = end
+    return blocks
+
+
+def process_shard(pdf_path, pages: list[int], extractor: str,
+                  options: dict | None = None) -> tuple[list, list[dict], list]:
+    """
+    Procesa un bloque de páginas sobre un ``mmap`` del PDF. Devuelve las
+    tablas largas por página (con su columna ``page``), las métricas y las
+    páginas que fallaron con su error.
+    """
+    module = get_module(extractor)
+    errors = []
+    with collect_records() as records, \
+            metrics_context(pdf=Path(pdf_path).name, extractor=extractor.upper(), shard=format_pages(pages)):
+        with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            with PdfSession(pdf_path, data=data) as session:
+                chunks = list(module.iter_long_format(pdf_path, pages, session=session, errors=errors,
+                                                      **(options or {})))
+    return chunks, records, errors
+
+
+def process_pdf_sharded(pdf_path, pages, extractor: str, workers: int | None = None,
+                        options: dict | None = None, errors: list | None = None):
+    """
+    Tabla larga de ``pages`` de un PDF, repartidas en ``workers`` procesos.
+    Las métricas de cada proceso se suman al colector activo. Con ``errors``
+    las páginas que fallan se anotan ahí y se omiten (como en ``iter_pages``);
+    sin ella, la primera que falla corta el trabajo.
+    """
+    module = get_module(extractor)
+    pages = sorted(set(as_page_list(pages)))
+    blocks = split_pages(pages, workers or 1)
+    if len(blocks) <= 1:
+        results = [process_shard(pdf_path, block, extractor, options) for block in blocks]
+    else:
+        preload_extractors([extractor])
+        with ProcessPoolExecutor(max_workers=len(blocks), initializer=configure_logging) as pool:
+            futures = [pool.submit(process_shard, pdf_path, block, extractor, options) for block in blocks]
+            results = [future.result() for future in futures]  # en orden de bloque = orden de página
+
+    chunks, failed = [], []
+    for block_chunks, records, block_errors in results:
+        chunks.extend(block_chunks)
+        failed.extend(block_errors)
+        merge_records(records)
+    if errors is None and failed:
+        page, error = failed[0]
+        raise ValueError(f"p{page}: {error}")
+    if errors is not None:
+        errors.extend(failed)
+        check_page_errors(pages, errors)
+    return module.concat_pages(chunks)
+
+
+def run_sharded_job(pdf_path: Path, pages: list[int], extractor: str, output_dir: Path,
+                    output_format: str = "excel", options: dict | None = None,
+                    store: Path | None = None, workers: int | None = None) -> JobResult:
+    """Como ``run_stream_job`` (una salida por PDF) pero con las páginas repartidas en ``workers`` procesos."""
+    def work():
+        df_final = process_pdf_sharded(pdf_path, pages, extractor, workers, options, result.page_errors)
+        return write_final(df_final, output_base_for(Path(pdf_path), None, extractor, output_dir),
+                           output_format, extractor, store)
+
+    result = JobResult(pdf=Path(pdf_path).name, page=min(pages), extractor=extractor, ok=False,
+                       pages=format_pages(pages))
+    return track_job(result, work, {"pages": result.pages, "workers": workers})
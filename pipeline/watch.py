@@ -0,0 +1,201 @@
+"""
+Modo vigilancia: sondea la carpeta de entrada y convierte cada PDF nuevo o
+modificado apenas termina de copiarse.
+
+- Un archivo se considera listo cuando su tamaño y mtime no cambian durante
+  ``settle_seconds`` y termina en ``%%EOF`` (descarta copias a medias).
+- Las páginas se detectan con el índice de páginas (ASFI / SOAT) y cada una se
+  encola como un trabajo de ``run_job`` en un pool de procesos que se mantiene
+  vivo (sin pagar el arranque de Python y las bibliotecas por archivo).
+- La cantidad de trabajos en vuelo está acotada; el resto espera en cola.
+- Lo ya procesado queda en un archivo de estado (tamaño, mtime por PDF), así
+  que reiniciar el servicio no vuelve a convertir todo. Un PDF se marca recién
+  cuando todos sus trabajos terminaron bien: si alguno falla, o el servicio se
+  detiene (Ctrl+C, SIGTERM) con trabajos en cola, se reintenta al reiniciar.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+import json
+import os
+import signal
+import threading
+import time
+
+from common.metrics import append_metrics, logger
+from common.page_index import build_page_index
+from pipeline.batch import JobResult, format_result, init_worker, preload_extractors, run_job
+from pipeline.registry import available_extractors
+
+STATE_FILE_NAME = ".watch_state.json"
+PDF_TAIL_BYTES = 1024
+
+
+def _signature(path: Path) -> list[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def scan_pdfs(input_dir: Path) -> dict[Path, list[int]]:
+    signatures = {}
+    for path in input_dir.glob("*.pdf"):
+        try:
+            signatures[path] = _signature(path)
+        except OSError:  # borrado o renombrado entre el glob y el stat
+            continue
+    return signatures
+
+
+def is_complete_pdf(path: Path) -> bool:
+    """True si el archivo termina con el marcador ``%%EOF`` de PDF."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - PDF_TAIL_BYTES))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _load_state(state_file: Path) -> dict:
+    try:
+        return json.loads(state_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state_file: Path, state: dict) -> None:
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state_file.with_name(state_file.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, state_file)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def discover_jobs(pdf_path: Path, extractors: list[str] | None = None) -> list[tuple[Path, int, str]]:
+    """Trabajos (pdf, página, extractor) según las páginas detectadas."""
+    index = build_page_index(pdf_path)
+    return [(pdf_path, page, extractor)
+            for extractor, pages in index.items()
+            if extractors is None or extractor in extractors
+            for page in pages]
+
+
+def watch_folder(input_dir: Path, output_dir: Path, extractors: list[str] | None = None,
+                 workers: int | None = None, output_format: str = "excel",
+                 options: dict[str, dict] | None = None, store: Path | None = None,
+                 poll_seconds: float = 2.0, settle_seconds: float = 5.0,
+                 state_file: Path | None = None, metrics_file: Path | None = None,
+                 max_polls: int | None = None) -> None:
+    """
+    Vigila ``input_dir`` hasta Ctrl+C (o ``max_polls`` sondeos).
+    ``extractors``: extractores a aplicar (None = todos los que detecta el índice).
+    ``options``: parámetros por extractor, p.ej. ``{"ASFI": {"word_backend": "pymupdf"}}``.
+    """
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    state_file = Path(state_file) if state_file else output_dir / STATE_FILE_NAME
+    state = _load_state(state_file)
+    options = options or {}
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+
+    pending = {}   # pdf -> (firma, momento desde el que está estable)
+    attempted = {}  # nombre -> firma ya encolada en esta corrida (terminara bien o no)
+    remaining = {}  # (nombre, firma) -> [trabajos sin terminar, todos bien hasta ahora]
+    queue = deque()  # ((pdf, página, extractor), (nombre, firma))
+    in_flight = {}
+
+    def finished(future, job: tuple, key: tuple) -> None:
+        result = _report(future, job, metrics_file)
+        counter = remaining[key]
+        counter[0] -= 1
+        counter[1] = counter[1] and result.ok
+        if counter[0] == 0:
+            del remaining[key]
+            if counter[1]:
+                state[key[0]] = list(key[1])
+                _save_state(state_file, state)
+
+    preload_extractors(extractors or available_extractors())
+
+    print(f"👀 Vigilando {input_dir} cada {poll_seconds:g}s con {workers} procesos (Ctrl+C para salir)")
+    polls = 0
+    # SIGTERM (p.ej. al redesplegar el contenedor) se detiene igual que Ctrl+C
+    main_thread = threading.current_thread() is threading.main_thread()
+    previous_sigterm = signal.signal(signal.SIGTERM, _raise_interrupt) if main_thread else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        try:
+            while max_polls is None or polls < max_polls:
+                polls += 1
+                now = time.monotonic()
+
+                # 1️⃣ Detectar archivos nuevos o modificados y esperar a que se asienten
+                for pdf, sig in scan_pdfs(input_dir).items():
+                    if state.get(pdf.name) == sig or attempted.get(pdf.name) == sig:
+                        continue
+                    previous = pending.get(pdf)
+                    if previous is None or previous[0] != sig:
+                        pending[pdf] = (sig, now)
+                        continue
+                    if now - previous[1] < settle_seconds or not is_complete_pdf(pdf):
+                        continue
+                    del pending[pdf]
+                    attempted[pdf.name] = sig
+                    try:
+                        jobs = discover_jobs(pdf, extractors)
+                    except Exception as e:
+                        # Sin marcar en el estado: se reintenta al reiniciar o si el archivo cambia
+                        print(f"❌ {pdf.name}: no se pudo indexar ({type(e).__name__}: {e})")
+                        continue
+                    print(f"📥 {pdf.name}: {len(jobs)} páginas en cola")
+                    if not jobs:
+                        state[pdf.name] = sig  # nada que convertir
+                        _save_state(state_file, state)
+                        continue
+                    key = (pdf.name, tuple(sig))
+                    remaining[key] = [len(jobs), True]
+                    queue.extend((job, key) for job in jobs)
+
+                # 2️⃣ Enviar trabajos sin superar el límite en vuelo
+                while queue and len(in_flight) < max_in_flight:
+                    (pdf, page, extractor), key = queue.popleft()
+                    future = pool.submit(run_job, pdf, page, extractor, output_dir, output_format,
+                                         options.get(extractor), store)
+                    in_flight[future] = ((pdf, page, extractor), key)
+
+                # 3️⃣ Recoger los terminados (espera como mucho un intervalo de sondeo)
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finished(future, *in_flight.pop(future))
+                else:
+                    time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            if main_thread:
+                signal.signal(signal.SIGTERM, signal.SIG_IGN)  # un SIGTERM repetido no corta la espera
+            print(f"\n⏹️ Deteniendo: esperando {len(in_flight)} trabajos en curso...")
+        try:
+            for future in list(in_flight):
+                finished(future, *in_flight.pop(future))
+        finally:
+            if main_thread:
+                signal.signal(signal.SIGTERM, previous_sigterm)
+    if queue:
+        # Sus PDF no quedan marcados en el estado: se retoman en el próximo arranque
+        logger.warning("%d trabajos en cola no se procesaron", len(queue))
+
+
+def _report(future, job: tuple, metrics_file: Path | None) -> JobResult:
+    pdf, page, extractor = job
+    try:
+        result = future.result()
+    except Exception as e:  # p.ej. el proceso hijo murió
+        result = JobResult(pdf=Path(pdf).name, page=page, extractor=extractor,
+                           ok=False, error=f"{type(e).__name__}: {e}")
+    print(f"  {format_result(result)}")
+    if metrics_file and result.metrics:
+        append_metrics(result.metrics, metrics_file)
+    return result
@@ -1,6 +1,13 @@
-from pathlib import Path
 import sys
-import pandas as pd
+import time
+_IMPORT_START = time.perf_counter()
+_MODULES_AT_START = len(sys.modules)  # los que ya trae el intérprete
+
+from itertools import groupby
+from pathlib import Path
+import argparse
+import os
+import tempfile
 
 # ------------------------------------------------------------
 # CONFIGURACIÓN DE RUTAS
@@ -10,12 +17,26 @@ sys.path.append(str(PROJECT_ROOT))
 
 # ------------------------------------------------------------
 # IMPORTACIONES DE MÓDULOS
+# (livianas: los extractores se importan al elegirlos, vía el registro)
 # ------------------------------------------------------------
-from build_table.soat import process_pdf_to_long_format as process_soat
-from build_table.asfi import process_pdf_to_long_format as process_asfi
+from pipeline.registry import (available_extractors, get_processor, import_profile,
+                               loaded_heavy_modules, print_import_profile)
+from pipeline.batch import combine_workbook, parse_pages, run_batch, print_summary, output_base_for
+from common.page_index import build_page_index
+from common.cache import CACHE_DIR_ENV, CACHE_MAX_MB_ENV
+from common.snapshot import SNAPSHOT_DIR_ENV
+from common.export import OUTPUT_FORMATS, write_long_table
+from common.store import upsert_long_table
+from common.metrics import (LOG_FORMAT_ENV, LOG_LEVEL_ENV, collect_records, configure_logging, count,
+                            metrics_context, stage, write_metrics)
+
+STARTUP_SECONDS = time.perf_counter() - _IMPORT_START
+STARTUP_MODULES = len(sys.modules) - _MODULES_AT_START
 
 # Carpeta donde estarán los PDFs
 INPUT_DIR = PROJECT_ROOT / "data" / "input"
+OUTPUT_DIR = PROJECT_ROOT / "data" / "output"
+SNAPSHOT_DIR = PROJECT_ROOT / "data" / "snapshots"
 
 # ------------------------------------------------------------
 # FUNCIÓN PARA SELECCIONAR EL PDF
@@ -36,18 +57,225 @@ def choose_pdf(input_dir: Path) -> Path | None:
             return pdfs[int(choice) - 1]
         print("Entrada inválida, intenta nuevamente.")
 
+# ------------------------------------------------------------
+# ARGUMENTOS DE LÍNEA DE COMANDOS (modo por lotes)
+# ------------------------------------------------------------
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Conversor PDF a Excel plano. Sin --pages funciona en modo interactivo."
+    )
+    parser.add_argument("--input-dir", type=Path, default=INPUT_DIR,
+                        help="Carpeta con los PDFs a procesar (default: data/input)")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR,
+                        help="Carpeta de salida (default: data/output)")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), default="excel",
+                        help="Formato de la tabla final (default: excel)")
+    parser.add_argument("--pages",
+                        help="Páginas a extraer de cada PDF, p.ej. '4,7-9', o 'auto' para detectarlas")
+    parser.add_argument("--extractor", type=str.upper, choices=available_extractors(),
+                        help="Extractor a usar en modo por lotes")
+    parser.add_argument("--word-backend", choices=["pdfplumber", "pymupdf"], default="pdfplumber",
+                        help="Motor de palabras del extractor ASFI (default: pdfplumber)")
+    parser.add_argument("--table-backend", choices=["pdfplumber", "pymupdf"], default="pdfplumber",
+                        help="Motor de detección de la grilla del extractor SOAT (default: pdfplumber)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Vigilar --input-dir y convertir cada PDF nuevo (páginas detectadas automáticamente)")
+    parser.add_argument("--poll-seconds", type=float, default=2.0,
+                        help="Modo vigilancia: intervalo de sondeo (default: 2)")
+    parser.add_argument("--settle-seconds", type=float, default=5.0,
+                        help="Modo vigilancia: tiempo sin cambios antes de procesar un archivo (default: 5)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Servidor HTTP local que mantiene los extractores cargados (POST /convert)")
+    parser.add_argument("--host", default="127.0.0.1", help="Modo servidor: dirección (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Modo servidor: puerto (default: 8765)")
+    parser.add_argument("--max-queue", type=int, default=16,
+                        help="Modo servidor: pedidos en curso + en espera antes de responder 503 (default: 16)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Lotes: procesar cada PDF en una pasada con memoria acotada y una sola salida por PDF")
+    parser.add_argument("--shard", action="store_true",
+                        help="Lotes: repartir las páginas de cada PDF entre --workers procesos (una salida por PDF)")
+    parser.add_argument("--workbook", type=Path,
+                        help="Lotes: juntar todas las salidas en este libro Excel, una hoja por página (o por PDF con --stream / --shard)")
+    parser.add_argument("--save-temp", action="store_true",
+                        help="Depuración: guardar también la tabla cruda de cada página ASFI en data/temp")
+    parser.add_argument("--store", type=Path,
+                        help="Base SQLite donde consolidar las filas (reemplaza las de cada archivo y página)")
+    parser.add_argument("--snapshot-dir", type=Path,
+                        help="Guardar instantáneas de palabras / grillas crudas por página (p.ej. data/snapshots)")
+    parser.add_argument("--replay", action="store_true",
+                        help="Reprocesar las instantáneas de --snapshot-dir (default: data/snapshots) sin abrir los PDF")
+    parser.add_argument("--cache-dir", type=Path,
+                        help="Carpeta de caché de extracciones (desactivada si no se indica)")
+    parser.add_argument("--cache-max-mb", type=float,
+                        help="Tamaño máximo de la caché en MB (default: 512)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Procesos en paralelo (default: todos los núcleos)")
+    parser.add_argument("--log-format", choices=["text", "json"], default="text",
+                        help="Formato de los registros en stderr (json: una línea por registro)")
+    parser.add_argument("--log-level", type=str.upper, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Nivel de log (default: INFO con --log-format json, WARNING si no)")
+    parser.add_argument("--metrics-file", type=Path,
+                        help="Archivo JSON donde guardar las métricas por etapa (JSON Lines en --watch)")
+    parser.add_argument("--import-profile", action="store_true",
+                        help="Mostrar el costo de importación del arranque y de cada extractor, y salir")
+    args = parser.parse_args(argv)
+    if args.log_level is None:
+        args.log_level = "INFO" if args.log_format == "json" else "WARNING"
+
+    if args.replay and (args.watch or args.serve or args.pages is not None):
+        parser.error("--replay no se combina con --watch, --serve ni --pages")
+    if args.serve and (args.watch or args.pages is not None):
+        parser.error("--serve no se combina con --watch ni con --pages")
+    if args.serve and (args.workers is not None and args.workers < 1 or args.max_queue < 1):
+        parser.error("--workers y --max-queue deben ser mayores que 0")
+    if args.workbook and args.pages is None:
+        parser.error("--workbook solo aplica en modo por lotes (--pages)")
+    if args.shard and (args.watch or args.stream):
+        parser.error("--shard no se combina con --watch ni con --stream")
+    if args.watch:
+        if args.pages is not None:
+            parser.error("--watch detecta las páginas solo; no se combina con --pages")
+        if args.workers is not None and args.workers < 1:
+            parser.error("--workers debe ser mayor que 0")
+    elif args.pages is not None:
+        if not args.extractor:
+            parser.error("--extractor es obligatorio en modo por lotes")
+        if args.pages.strip().lower() == "auto":
+            args.page_list = None
+        else:
+            try:
+                args.page_list = parse_pages(args.pages)
+            except ValueError as e:
+                parser.error(str(e))
+        if args.page_list == []:
+            parser.error("--pages no contiene ninguna página")
+        if args.workers is not None and args.workers < 1:
+            parser.error("--workers debe ser mayor que 0")
+    return args
+
+def extractor_options(args: argparse.Namespace, extractor: str) -> dict:
+    """Parámetros de línea de comandos que aplican al extractor elegido."""
+    if extractor == "ASFI":
+        return {"word_backend": args.word_backend, "save_temp": args.save_temp}
+    if extractor == "SOAT":
+        return {"table_backend": args.table_backend}
+    return {}
+
+# ------------------------------------------------------------
+# MODO POR LOTES
+# ------------------------------------------------------------
+def main_batch(args: argparse.Namespace) -> int:
+    pdfs = sorted(args.input_dir.glob("*.pdf"))
+    if not pdfs:
+        print(f"❌ No se encontraron PDFs en: {args.input_dir}")
+        return 1
+
+    if args.page_list is None:
+        # Pre-escaneo liviano: solo las páginas con tablas del extractor elegido
+        jobs = []
+        for pdf in pdfs:
+            pages = build_page_index(pdf)[args.extractor]
+            print(f"🔎 {pdf.name}: páginas {args.extractor} detectadas {pages or '—'}")
+            jobs.extend((pdf, page) for page in pages)
+        if not jobs:
+            print(f"❌ No se detectaron páginas {args.extractor} en: {args.input_dir}")
+            return 1
+        print(f"⚙️ {len(jobs)} trabajos con {args.workers} procesos...")
+    else:
+        jobs = [(pdf, page) for pdf in pdfs for page in args.page_list]
+        print(f"⚙️ {len(jobs)} trabajos ({len(pdfs)} PDFs × {len(args.page_list)} páginas) "
+              f"con {args.workers} procesos...")
+
+    with tempfile.TemporaryDirectory(prefix="conversor_") as tmp:
+        # Con --workbook cada trabajo escribe Parquet (barato) y al final se juntan en un libro
+        output_dir, output_format = (Path(tmp), "parquet") if args.workbook else (args.output_dir, args.output_format)
+        if args.shard:
+            # Un PDF a la vez, con todos los procesos sobre sus páginas
+            from pipeline.shard import run_sharded_job
+            results = [run_sharded_job(pdf, [page for _, page in pdf_jobs], args.extractor, output_dir,
+                                       output_format, extractor_options(args, args.extractor),
+                                       args.store, args.workers)
+                       for pdf, pdf_jobs in groupby(jobs, key=lambda job: job[0])]
+        else:
+            results = run_batch(jobs, args.extractor, output_dir, workers=args.workers,
+                                output_format=output_format,
+                                options=extractor_options(args, args.extractor), store=args.store,
+                                stream=args.stream)
+        if args.workbook:
+            workbook = combine_workbook(results, args.workbook)
+    print_summary(results)
+    if args.workbook and workbook:
+        print(f"📗 Libro con todas las salidas en: {workbook}")
+    if args.metrics_file:
+        write_metrics([record for r in results for record in r.metrics], args.metrics_file)
+        print(f"📈 Métricas en: {args.metrics_file}")
+    return 0 if all(r.complete for r in results) else 1
+
+def main_replay(args: argparse.Namespace) -> int:
+    from pipeline.replay import run_replay
+    snapshot_dir = args.snapshot_dir or SNAPSHOT_DIR
+    start = time.perf_counter()
+    results = run_replay(snapshot_dir, args.output_dir, args.extractor, args.output_format, args.store)
+    if not results:
+        print(f"❌ No se encontraron instantáneas en: {snapshot_dir}")
+        return 1
+    print_summary(results)
+    print(f"⚡ {len(results)} páginas reprocesadas desde instantáneas en {time.perf_counter() - start:.1f}s")
+    if args.metrics_file:
+        write_metrics([record for r in results for record in r.metrics], args.metrics_file)
+        print(f"📈 Métricas en: {args.metrics_file}")
+    return 0 if all(r.complete for r in results) else 1
+
 # ------------------------------------------------------------
 # FUNCIÓN PRINCIPAL
 # ------------------------------------------------------------
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+    if args.cache_dir:
+        os.environ[CACHE_DIR_ENV] = str(args.cache_dir)
+    if args.snapshot_dir and not args.replay:
+        os.environ[SNAPSHOT_DIR_ENV] = str(args.snapshot_dir)
+    if args.cache_max_mb:
+        os.environ[CACHE_MAX_MB_ENV] = str(args.cache_max_mb)
+    os.environ[LOG_FORMAT_ENV] = args.log_format
+    os.environ[LOG_LEVEL_ENV] = args.log_level
+    configure_logging()
+    if args.import_profile:
+        startup = {"name": "arranque CLI", "seconds": STARTUP_SECONDS,
+                   "new_modules": STARTUP_MODULES, "heavy": loaded_heavy_modules()}
+        names = [args.extractor] if args.extractor else None
+        print_import_profile([startup] + import_profile(names))
+        return 0
+    if args.replay:
+        return main_replay(args)
+    if args.serve:
+        from pipeline.server import serve
+        serve(args.output_dir, host=args.host, port=args.port, workers=args.workers,
+              max_queue=args.max_queue, output_format=args.output_format,
+              options={e: extractor_options(args, e) for e in available_extractors()})
+        return 0
+    if args.watch:
+        from pipeline.watch import watch_folder
+        watch_folder(args.input_dir, args.output_dir,
+                     extractors=[args.extractor] if args.extractor else None,
+                     workers=args.workers, output_format=args.output_format,
+                     options={e: extractor_options(args, e) for e in available_extractors()},
+                     store=args.store, poll_seconds=args.poll_seconds,
+                     settle_seconds=args.settle_seconds, metrics_file=args.metrics_file)
+        return 0
+    if args.pages is not None:
+        return main_batch(args)
+
     print("=== Conversor IA — Procesamiento PDF a Excel plano ===")
 
     # 1️⃣ Seleccionar PDF
-    pdf_path = choose_pdf(INPUT_DIR)
+    pdf_path = choose_pdf(args.input_dir)
     if not pdf_path:
         return
 
-    # 2️⃣ Pedir número de página
+    # 2️⃣ Pedir número de página (mostrando las páginas detectadas)
+    index = build_page_index(pdf_path)
+    print("\n🔎 Páginas detectadas: " + ", ".join(f"{k} {v or '—'}" for k, v in index.items()))
     while True:
         page_input = input("\n👉 Ingresa el número de página que deseas extraer: ").strip()
         if page_input.isdigit() and int(page_input) > 0:
@@ -56,29 +284,37 @@ def main():
         print("Número inválido. Intenta de nuevo.")
 
     # 3️⃣ Elegir extractor
-    extractor = input("➡️ Ingresa extractor (ASFI / SOAT): ").strip().upper()
+    extractor = input(f"➡️ Ingresa extractor ({' / '.join(available_extractors())}): ").strip().upper()
 
-    # 4️⃣ Procesar según extractor
-    print("\n⚙️ Procesando... por favor espera...\n")
-    if extractor == "SOAT":
-        df_final = process_soat(str(pdf_path), page_number, extractor)
-    elif extractor == "ASFI":
-        df_final = process_asfi(str(pdf_path), page_number, extractor)
-    else:
-        print(f"❌ Extractor '{extractor}' no reconocido. Usa 'ASFI' o 'SOAT'.")
+    if extractor not in available_extractors():
+        print(f"❌ Extractor '{extractor}' no reconocido. Usa {' / '.join(available_extractors())}.")
         return
+    process = get_processor(extractor)
 
-    # 5️⃣ Exportar Excel final
-    output_dir = PROJECT_ROOT / "data" / "output"
-    output_dir.mkdir(parents=True, exist_ok=True)
+    with collect_records() as records, \
+            metrics_context(pdf=pdf_path.name, page=page_number, extractor=extractor):
+        # 4️⃣ Procesar según extractor
+        print("\n⚙️ Procesando... por favor espera...\n")
+        df_final = process(str(pdf_path), page_number, extractor, **extractor_options(args, extractor))
 
-    output_file = output_dir / f"{pdf_path.stem}_page{page_number}_{extractor}_final.xlsx"
-    df_final.to_excel(output_file, index=False)
+        # 5️⃣ Exportar tabla final (Excel por defecto)
+        output_base = output_base_for(pdf_path, page_number, extractor, args.output_dir)
+        with stage("export", format=args.output_format):
+            output_file = write_long_table(df_final, output_base, args.output_format)
+            count(rows=len(df_final))
+        if args.store:
+            with stage("store"):
+                count(rows=upsert_long_table(args.store, df_final, extractor, page_number))
 
-    print(f"\n✅ Excel final generado correctamente en:\n   {output_file}")
+    print(f"\n✅ Archivo final generado correctamente en:\n   {output_file}")
+    if args.store:
+        print(f"🗄️ Filas consolidadas en: {args.store}")
+    if args.metrics_file:
+        write_metrics(records, args.metrics_file)
+        print(f"📈 Métricas en: {args.metrics_file}")
 
 # ------------------------------------------------------------
 # EJECUCIÓN DIRECTA
 # ------------------------------------------------------------
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Fixtures comunes: boletines sintéticos (``benchmarks.synthetic``) creados una
+vez por sesión y la caché de extracciones siempre desactivada.
+"""
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.synthetic import make_asfi_pdf, make_soat_pdf  # noqa: E402
+from common.cache import CACHE_DIR_ENV  # noqa: E402
+from common.snapshot import SNAPSHOT_DIR_ENV  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    """Medir y comparar siempre la extracción real, sin caché ni instantáneas."""
+    monkeypatch.delenv(CACHE_DIR_ENV, raising=False)
+    monkeypatch.delenv(SNAPSHOT_DIR_ENV, raising=False)
+
+
+@pytest.fixture(scope="session")
+def asfi_pdf(tmp_path_factory) -> Path:
+    return make_asfi_pdf(tmp_path_factory.mktemp("asfi") / "2025-04-30_asfi.pdf", pages=2, rows=40, groups=2)
+
+
+@pytest.fixture(scope="session")
+def soat_pdf(tmp_path_factory) -> Path:
+    return make_soat_pdf(tmp_path_factory.mktemp("soat") / "2025-06-30_soat.pdf", pages=2, vehicles=13)
@@ -0,0 +1,35 @@
+"""
+Paridad de motores: PyMuPDF debe dar exactamente la misma tabla que pdfplumber
+(palabras ASFI y grilla SOAT), igual que ``benchmarks/run.py --parity``.
+"""
+import pandas as pd
+import pytest
+
+from build_table.asfi import process_pdf_to_long_format as asfi_long_format
+from build_table.soat import process_pdf_to_long_format as soat_long_format
+from extract_table.asfi import WORD_BACKENDS, extract_asfi_table
+from extract_table.soat import TABLE_BACKENDS, extract_table_from_pdf
+
+
+@pytest.mark.parametrize("page", [1, 2])
+def test_asfi_word_backends_give_same_table(asfi_pdf, page):
+    plumber, pymupdf = (extract_asfi_table(asfi_pdf, page, word_backend=b) for b in WORD_BACKENDS)
+    assert not plumber.empty
+    pd.testing.assert_frame_equal(plumber, pymupdf)
+
+
+def test_asfi_word_backends_give_same_long_table(asfi_pdf):
+    plumber, pymupdf = (asfi_long_format(asfi_pdf, [1, 2], word_backend=b) for b in WORD_BACKENDS)
+    pd.testing.assert_frame_equal(plumber, pymupdf)
+
+
+@pytest.mark.parametrize("page", [1, 2])
+def test_soat_table_backends_give_same_grid(soat_pdf, page):
+    plumber, pymupdf = (extract_table_from_pdf(str(soat_pdf), page, table_backend=b) for b in TABLE_BACKENDS)
+    assert not plumber.empty
+    pd.testing.assert_frame_equal(plumber, pymupdf)
+
+
+def test_soat_table_backends_give_same_long_table(soat_pdf):
+    plumber, pymupdf = (soat_long_format(soat_pdf, [1, 2], "SOAT", table_backend=b) for b in TABLE_BACKENDS)
+    pd.testing.assert_frame_equal(plumber, pymupdf)
@@ -0,0 +1,45 @@
+"""
+Trabajos por lotes: las páginas que fallan en modo streaming no cortan el
+documento ni dejan salidas a medias.
+"""
+import gc
+import tempfile
+
+import pandas as pd
+import pytest
+
+from common.export import LongTableWriter
+from pipeline.batch import run_stream_job
+
+
+def test_stream_job_skips_failing_pages(asfi_pdf, tmp_path):
+    result = run_stream_job(asfi_pdf, [1, 2, 3], "ASFI", tmp_path, "csv")
+    assert result.ok and not result.complete
+    assert [page for page, _ in result.page_errors] == [3]
+    df = pd.read_csv(result.output)
+    assert sorted(df["page"].unique()) == [1, 2]
+    assert result.rows == len(df)
+
+
+def test_stream_job_without_pages_leaves_no_output(asfi_pdf, tmp_path):
+    result = run_stream_job(asfi_pdf, [5, 6], "ASFI", tmp_path, "csv")
+    assert not result.ok
+    assert "Ninguna página" in result.error
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "excel"])
+def test_writer_discards_output_on_error(tmp_path, monkeypatch, output_format):
+    scratch = tmp_path / "tmp"
+    scratch.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(scratch))  # temporales de openpyxl
+    out = tmp_path / "out"
+    out.mkdir()
+    with pytest.raises(RuntimeError):
+        with LongTableWriter(out / "tabla", output_format) as writer:
+            writer.write(pd.DataFrame({"file": ["a.pdf"], "valor": [1.0]}))
+            raise RuntimeError("falla a mitad del documento")
+    gc.collect()
+    assert list(out.iterdir()) == []
+    assert list(scratch.iterdir()) == []
@@ -0,0 +1,66 @@
+"""
+Escritura de la tabla larga: Excel en streaming (una o varias hojas), CSV y Parquet.
+"""
+import shutil
+
+import pandas as pd
+import pytest
+
+from build_table.asfi import process_pdf_to_long_format
+from common.cache import CACHE_DIR_ENV
+from common.export import LongTableWriter, sheet_name, write_long_table, write_workbook
+from extract_table.asfi import extract_asfi_table, save_temp_table
+
+
+def test_excel_keeps_repeated_headers(tmp_path):
+    df = pd.DataFrame([["Cuenta 1", 1.0, 2.0, 3.0, 4.0, 5.0, 6.0]],
+                      columns=["CONCEPTO", "MN+UFV", "ME+MV", "TOTAL", "MN+UFV", "ME+MV", "TOTAL"])
+    path = write_long_table(df, tmp_path / "repetidas", "excel")
+    back = pd.read_excel(path, header=None)
+    assert back.shape == (2, 7)
+    assert back.iloc[0].tolist() == list(df.columns)
+    assert back.iloc[1, 1:].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_save_temp_table_matches_raw_asfi_table(asfi_pdf, tmp_path):
+    df = extract_asfi_table(asfi_pdf, 1)
+    assert not df.columns.is_unique  # dos grupos MN+UFV / ME+MV / TOTAL
+    path = save_temp_table(df, tmp_path / "input" / asfi_pdf.name, 1)
+    back = pd.read_excel(path, header=None, dtype=str, keep_default_na=False)
+    assert back.shape == (len(df) + 1, df.shape[1])
+    assert back.iloc[0].tolist() == [str(c) for c in df.columns]
+
+
+def test_save_temp_also_on_cache_hit(asfi_pdf, tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    pdf = tmp_path / "input" / asfi_pdf.name
+    pdf.parent.mkdir()
+    shutil.copy(asfi_pdf, pdf)
+    temp_file = tmp_path / "temp" / f"{pdf.stem}_page1_asfi_temp.xlsx"
+    for _ in range(2):  # la segunda vez la tabla sale de la caché
+        temp_file.unlink(missing_ok=True)
+        process_pdf_to_long_format(pdf, 1, save_temp=True)
+        assert temp_file.exists()
+
+
+def test_writer_aligns_reordered_and_missing_columns(tmp_path):
+    with LongTableWriter(tmp_path / "out", "csv", columns=["a", "b", "c"]) as writer:
+        writer.write(pd.DataFrame({"b": [1], "a": [2]}))
+        with pytest.raises(ValueError):
+            writer.write(pd.DataFrame({"a": [1], "z": [2]}))
+    back = pd.read_csv(writer.path)
+    assert back.columns.tolist() == ["a", "b", "c"]
+    assert back.iloc[0, :2].tolist() == [2, 1]
+
+
+def test_workbook_has_one_sheet_per_table(tmp_path):
+    tables = [("boletin_p1", pd.DataFrame({"x": [1, 2]})), ("boletin_p1", pd.DataFrame({"y": [3]}))]
+    path = write_workbook(tables, tmp_path / "libro.xlsx")
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == ["boletin_p1", "boletin_p1_2"]
+    assert sheets["boletin_p1_2"].columns.tolist() == ["y"]
+
+
+def test_sheet_name_is_valid_for_excel():
+    assert sheet_name("a/b:c[1]") == "a_b_c_1_"
+    assert len(sheet_name("x" * 40)) == 31
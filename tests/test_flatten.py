@@ -0,0 +1,128 @@
+"""
+Armado de la tabla larga sobre tablas crudas pequeñas. Los resultados esperados
+son los que daba el armado fila por fila (iterrows) anterior a la versión
+vectorizada (en ASFI, con el valor ya convertido a número).
+"""
+import numpy as np
+import pandas as pd
+
+from build_table.asfi import build_flat_table_asfi
+from build_table.soat import build_flat_table, clean_service_logic
+
+ASFI_RAW = pd.DataFrame({
+    "CONCEPTO": ["DISPONIBILIDADES", "Caja", "Banco Central", "", "BANCOS", "Bancos múltiples", "GRUPO 2024",
+                 "Bancos PYME", "(A) Total disponibilidades", "Otras 2024", "INVERSIONES TEMPORARIAS", "Fondos",
+                 "Depósitos a plazo"],
+    "MN+UFV": [np.nan, 1234.5, "(12,30)", np.nan, np.nan, 10.0, np.nan, np.nan, 5.0, 7.0, np.nan, "n/d", -3.25],
+    "ME+MV": [np.nan, 1.0, 2.0, np.nan, np.nan, "", np.nan, 4.0, 6.0, 8.0, np.nan, None, 0.0],
+    "TOTAL": [np.nan, 1235.5, "1.234.567,89", np.nan, np.nan, 10.0, np.nan, 4.0, 11.0, 15.0, np.nan, "  ", -3.25],
+})
+
+# (nv1 sección, nv2 concepto, nv3 grupo, nv4 columna, valor)
+ASFI_EXPECTED = [
+    ("DISPONIBILIDADES", "Caja", "", "MN+UFV", 1234.5),
+    ("DISPONIBILIDADES", "Caja", "", "ME+MV", 1.0),
+    ("DISPONIBILIDADES", "Caja", "", "TOTAL", 1235.5),
+    ("DISPONIBILIDADES", "Banco Central", "", "MN+UFV", -12.3),
+    ("DISPONIBILIDADES", "Banco Central", "", "ME+MV", 2.0),
+    ("DISPONIBILIDADES", "Banco Central", "", "TOTAL", 1234567.89),
+    ("BANCOS", "Bancos múltiples", "", "MN+UFV", 10.0),
+    ("BANCOS", "Bancos múltiples", "", "TOTAL", 10.0),
+    ("BANCOS", "Bancos PYME", "GRUPO 2024", "ME+MV", 4.0),
+    ("BANCOS", "Bancos PYME", "GRUPO 2024", "TOTAL", 4.0),
+    ("(A) Total disponibilidades", "Otras 2024", "GRUPO 2024", "MN+UFV", 7.0),
+    ("(A) Total disponibilidades", "Otras 2024", "GRUPO 2024", "ME+MV", 8.0),
+    ("(A) Total disponibilidades", "Otras 2024", "GRUPO 2024", "TOTAL", 15.0),
+    ("INVERSIONES TEMPORARIAS", "Fondos", "GRUPO 2024", "MN+UFV", np.nan),
+    ("INVERSIONES TEMPORARIAS", "Depósitos a plazo", "GRUPO 2024", "MN+UFV", -3.25),
+    ("INVERSIONES TEMPORARIAS", "Depósitos a plazo", "GRUPO 2024", "ME+MV", 0.0),
+    ("INVERSIONES TEMPORARIAS", "Depósitos a plazo", "GRUPO 2024", "TOTAL", -3.25),
+]
+
+
+def _plain(df: pd.DataFrame, columns: list) -> list:
+    return [tuple(row) for row in df[columns].astype(object).itertuples(index=False, name=None)]
+
+
+def test_asfi_sections_groups_and_values():
+    df = build_flat_table_asfi(ASFI_RAW, ["Título"], "x.pdf", "2025-04-30")
+    assert _plain(df, ["nv1", "nv2", "nv3", "nv4"]) == [row[:4] for row in ASFI_EXPECTED]
+    np.testing.assert_array_equal(df["valor"].to_numpy(), [row[4] for row in ASFI_EXPECTED])
+    assert set(df["file"]) == {"x.pdf"} and set(df["titulo1"]) == {"Título"}
+    assert set(df["nv5"]) == {"En millones de bolivianos"}
+    assert (df["fecha"] == pd.Timestamp("2025-04-30")).all()
+    # El texto que no es número se conserva aparte (el armado anterior lo dejaba vacío)
+    assert df["valor_texto"].tolist() == [None] * 13 + ["n/d"] + [None] * 3
+
+
+# Columna "TIPO DE USO" con marcadores de servicio, filas en blanco, celdas
+# None / nan y totales con el departamento en nv1 o en nv2
+SOAT_RAW = pd.DataFrame([
+    ["DEPARTAMENTO", "USO", "AUTOMOVIL", "TIPO DE\nUSO", "", "CAMION\nPESADO"],
+    ["CHUQUISACA", "", "10", "SERVICIO PARTICULAR", "x", "20"],
+    ["CHUQUISACA", "", "1", "servicio público", "", "None"],
+    ["CHUQUISACA", "SERVICIO PÚBLICO", "2", "", "", "nan"],
+    ["", "", "", "", "", ""],
+    ["TOTAL CHUQUISACA", "", "13", "", "", "20"],
+    ["LA PAZ", "Total La Paz", "5", "", "", "6"],
+    ["", "SERVICIO PARTICULAR", "7", "", "", "8"],
+])
+
+# (nv1, nv2, nv3, value) de build_flat_table
+SOAT_FLAT = [
+    ("CHUQUISACA", "", "AUTOMOVIL", "10"),
+    ("CHUQUISACA", "", "TIPO DE / USO", "SERVICIO PARTICULAR"),
+    ("CHUQUISACA", "", "CAMION / PESADO", "20"),
+    ("CHUQUISACA", "", "AUTOMOVIL", "1"),
+    ("CHUQUISACA", "", "TIPO DE / USO", "servicio público"),
+    ("CHUQUISACA", "", "CAMION / PESADO", ""),
+    ("CHUQUISACA", "SERVICIO PÚBLICO", "AUTOMOVIL", "2"),
+    ("CHUQUISACA", "SERVICIO PÚBLICO", "TIPO DE / USO", ""),
+    ("CHUQUISACA", "SERVICIO PÚBLICO", "CAMION / PESADO", ""),
+    ("TOTAL CHUQUISACA", "", "AUTOMOVIL", "13"),
+    ("TOTAL CHUQUISACA", "", "TIPO DE / USO", ""),
+    ("TOTAL CHUQUISACA", "", "CAMION / PESADO", "20"),
+    ("LA PAZ", "Total La Paz", "AUTOMOVIL", "5"),
+    ("LA PAZ", "Total La Paz", "TIPO DE / USO", ""),
+    ("LA PAZ", "Total La Paz", "CAMION / PESADO", "6"),
+    ("", "SERVICIO PARTICULAR", "AUTOMOVIL", "7"),
+    ("", "SERVICIO PARTICULAR", "TIPO DE / USO", ""),
+    ("", "SERVICIO PARTICULAR", "CAMION / PESADO", "8"),
+]
+
+# Después de clean_service_logic: sin las filas marcador, el servicio vigente
+# en las filas sin uso y los totales separados en departamento / TOTAL
+SOAT_CLEAN = [
+    ("CHUQUISACA", "", "AUTOMOVIL", "10"),
+    ("CHUQUISACA", "SERVICIO PARTICULAR", "CAMION / PESADO", "20"),
+    ("CHUQUISACA", "SERVICIO PARTICULAR", "AUTOMOVIL", "1"),
+    ("CHUQUISACA", "servicio público", "CAMION / PESADO", ""),
+    ("CHUQUISACA", "SERVICIO PÚBLICO", "AUTOMOVIL", "2"),
+    ("CHUQUISACA", "SERVICIO PÚBLICO", "TIPO DE / USO", ""),
+    ("CHUQUISACA", "SERVICIO PÚBLICO", "CAMION / PESADO", ""),
+    ("CHUQUISACA", "TOTAL", "AUTOMOVIL", "13"),
+    ("CHUQUISACA", "TOTAL", "TIPO DE / USO", ""),
+    ("CHUQUISACA", "TOTAL", "CAMION / PESADO", "20"),
+    ("La Paz", "TOTAL", "AUTOMOVIL", "5"),
+    ("La Paz", "TOTAL", "TIPO DE / USO", ""),
+    ("La Paz", "TOTAL", "CAMION / PESADO", "6"),
+    ("", "SERVICIO PARTICULAR", "AUTOMOVIL", "7"),
+    ("", "SERVICIO PARTICULAR", "TIPO DE / USO", ""),
+    ("", "SERVICIO PARTICULAR", "CAMION / PESADO", "8"),
+]
+
+
+def test_soat_flat_table():
+    df = build_flat_table(SOAT_RAW, {"title_1": "T"}, "s.pdf", "2025-06-30")
+    assert df.columns.tolist() == ["file", "title_1", "nv1", "nv2", "nv3", "date", "value"]
+    assert _plain(df, ["nv1", "nv2", "nv3", "value"]) == SOAT_FLAT
+    assert set(df["file"]) == {"s.pdf"} and set(df["title_1"]) == {"T"} and set(df["date"]) == {"2025-06-30"}
+
+
+def test_soat_service_markers_and_totals():
+    flat = pd.DataFrame(SOAT_FLAT, columns=["nv1", "nv2", "nv3", "value"]).assign(file="s.pdf", title_1="T",
+                                                                                   date="2025-06-30")
+    df = clean_service_logic(flat, {"title_1": "T"})
+    assert df.columns.tolist() == ["file", "title_1", "nv1", "nv2", "nv3", "date", "value"]
+    assert _plain(df, ["nv1", "nv2", "nv3", "value"]) == SOAT_CLEAN
+    assert df.index.tolist() == list(range(len(SOAT_CLEAN)))
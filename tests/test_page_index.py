@@ -0,0 +1,61 @@
+"""
+Pre-escaneo de páginas: grillas SOAT de verdad frente a dibujos que no son tablas.
+"""
+import fitz
+
+from common.page_index import build_page_index
+
+
+def _pdf_with(tmp_path, name, draw):
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((40, 40), "Página de prueba", fontsize=10)
+    draw(page)
+    path = tmp_path / name
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _bar_chart(page):
+    # ejes, líneas guía y tres barras de distinta altura
+    page.draw_line((80, 100), (80, 400))
+    page.draw_line((80, 400), (500, 400))
+    for y in (150, 250, 350):
+        page.draw_line((80, y), (500, y), color=(0.7, 0.7, 0.7))
+    for x, top in ((120, 130), (240, 220), (360, 300)):
+        page.draw_rect(fitz.Rect(x, top, x + 80, 400), fill=(0.2, 0.4, 0.8))
+
+
+def _framed_boxes(page):
+    for rect in ((50, 100, 250, 180), (300, 120, 520, 260), (60, 300, 200, 420), (260, 330, 540, 380)):
+        page.draw_rect(fitz.Rect(*rect), width=0.8)
+
+
+def _line_grid(page):
+    xs = [50, 150, 250, 350, 450]
+    ys = [100, 130, 160, 190]
+    for y in ys:
+        page.draw_line((xs[0], y), (xs[-1], y))
+    for x in xs:
+        page.draw_line((x, ys[0]), (x, ys[-1]))
+
+
+def test_soat_grid_is_detected(soat_pdf):
+    assert build_page_index(soat_pdf) == {"ASFI": [], "SOAT": [1, 2]}
+
+
+def test_line_grid_is_detected(tmp_path):
+    assert build_page_index(_pdf_with(tmp_path, "grilla.pdf", _line_grid))["SOAT"] == [1]
+
+
+def test_bar_chart_is_not_a_table(tmp_path):
+    assert build_page_index(_pdf_with(tmp_path, "barras.pdf", _bar_chart))["SOAT"] == []
+
+
+def test_framed_boxes_are_not_a_table(tmp_path):
+    assert build_page_index(_pdf_with(tmp_path, "recuadros.pdf", _framed_boxes))["SOAT"] == []
+
+
+def test_asfi_pages_are_not_soat(asfi_pdf):
+    assert build_page_index(asfi_pdf) == {"ASFI": [1, 2], "SOAT": []}
@@ -0,0 +1,37 @@
+"""
+Conversión en bloque de números en formato boliviano.
+"""
+import numpy as np
+import pandas as pd
+
+from common.parse_number import parse_numbers
+
+
+def test_bolivian_formats():
+    numbers, invalid = parse_numbers(["1.234.567,89", "12,5", "1.000", "0,00", "-3,25", "(12,30)",
+                                      "(1.234,56)", " 45 ", "1 234,5", "Bs 7,5"])
+    np.testing.assert_array_equal(numbers, [1234567.89, 12.5, 1000.0, 0.0, -3.25, -12.3,
+                                            -1234.56, 45.0, 1234.5, 7.5])
+    assert not invalid.any()
+
+
+def test_empty_cells_are_nan_but_not_invalid():
+    numbers, invalid = parse_numbers(["", "  ", "-", " - ", "nan", "None", None, np.nan])
+    assert np.isnan(numbers).all()
+    assert not invalid.any()
+
+
+def test_invalid_mask_marks_text():
+    numbers, invalid = parse_numbers(pd.Series(["10", "n/d", "", "s/d", "(5)"], index=[7, 8, 9, 10, 11]))
+    np.testing.assert_array_equal(numbers, [10.0, np.nan, np.nan, np.nan, -5.0])
+    assert invalid.tolist() == [False, True, False, True, False]
+
+
+def test_numeric_and_mixed_values():
+    numbers, invalid = parse_numbers(pd.Series([1.5, np.nan, 3]))
+    np.testing.assert_array_equal(numbers, [1.5, np.nan, 3.0])
+    assert not invalid.any()
+    # Columnas mezcladas (valores ya convertidos y textos): los números se conservan
+    numbers, invalid = parse_numbers(pd.Series([1234.5, "1.234,5", None, "x"], dtype=object))
+    np.testing.assert_array_equal(numbers, [1234.5, 1234.5, np.nan, np.nan])
+    assert invalid.tolist() == [False, False, False, True]
@@ -0,0 +1,27 @@
+"""
+Validación de los pedidos del servidor: solo se aceptan las opciones previstas.
+"""
+import pytest
+
+from pipeline.server import BadRequest, _parse_request
+
+
+def _body(pdf, extractor, options):
+    return {"pdf": str(pdf), "pages": 1, "extractor": extractor, "options": options}
+
+
+@pytest.mark.parametrize("options", [{"save_temp": True}, {"no_existe": 1}, {"table_backend": "pymupdf"}])
+def test_unknown_options_are_rejected(asfi_pdf, options):
+    with pytest.raises(BadRequest) as e:
+        _parse_request(_body(asfi_pdf, "ASFI", options))
+    assert e.value.status == 400
+
+
+def test_invalid_backend_is_rejected(soat_pdf):
+    with pytest.raises(BadRequest, match="table_backend"):
+        _parse_request(_body(soat_pdf, "SOAT", {"table_backend": "camelot"}))
+
+
+def test_backend_option_is_accepted(asfi_pdf, soat_pdf):
+    assert _parse_request(_body(asfi_pdf, "ASFI", {"word_backend": "pymupdf"}))["options"] == {"word_backend": "pymupdf"}
+    assert _parse_request(_body(soat_pdf, "SOAT", {}))["options"] == {}
@@ -0,0 +1,58 @@
+"""
+Heurísticas SOAT sobre la grilla cruda: cabeceras MOTOCICLETA / TOTAL GENERAL
+corridas una columna a la izquierda y filas de totales con el mismo corrimiento.
+"""
+from extract_table.soat import soat_table_from_grid
+
+
+def _row(dept, use, auto, jeep, moto, moto_data, total, total_data):
+    # 29 columnas, como la grilla original: MOTOCICLETA en 4 y TOTAL GENERAL en 27
+    return [dept, use, auto, jeep, moto, moto_data] + [None] * 21 + [total, total_data]
+
+
+GRID = [
+    ["DEPARTAMENTO", "USO", "AUTOMOVIL", "JEEP", "MOTOCICLETA"] + [""] * 22 + ["TOTAL GENERAL", None],
+    _row("CHUQUISACA ", "SERVICIO PARTICULAR", "10", "20", "", "5", "", "35"),
+    _row("", " SERVICIO PÚBLICO", "1", "2", None, "3", "", "6"),
+    _row("TOTAL CHUQUISACA", "", "11", "22", "", "8", "", "41"),
+    _row("PANDO", "SERVICIO PARTICULAR", "1", "1", "4", "", "", "6"),
+    _row("TOTAL PANDO", "", "1", "1", "4", "", "6", ""),
+    _row("total general", "", "12", "23", "12", "", "47", "0"),
+]
+
+# Resultado de la corrección fila por fila anterior (columnas fijas 4→5 y 27→28)
+EXPECTED = [
+    ["DEPARTAMENTO", "USO", "AUTOMOVIL", "JEEP", "", "MOTOCICLETA", "", "TOTAL GENERAL"],
+    ["CHUQUISACA", "SERVICIO PARTICULAR", "10", "20", "", "5", "", "35"],
+    ["CHUQUISACA", "SERVICIO PÚBLICO", "1", "2", "", "3", "", "6"],
+    ["TOTAL CHUQUISACA", "", "11", "22", "", "8", "", "41"],
+    ["PANDO", "SERVICIO PARTICULAR", "1", "1", "4", "", "", "6"],
+    ["TOTAL PANDO", "", "1", "1", "", "4", "", "6"],
+    ["total general", "", "12", "23", "", "12", "47", "0"],
+]
+
+
+def test_shifted_headers_and_total_rows():
+    df = soat_table_from_grid(GRID, 1)
+    assert df.columns.tolist() == list(range(8))
+    assert df.values.tolist() == EXPECTED
+
+
+def test_shifted_columns_follow_the_header():
+    # Con otra cantidad de clases de vehículo las columnas corridas salen de la cabecera
+    grid = [
+        ["DEPARTAMENTO", "USO", "MOTOCICLETA", "", "TOTAL GENERAL", ""],
+        ["LA PAZ", "SERVICIO PARTICULAR", "", "7", "", "9"],
+        ["TOTAL GENERAL", "", "7", "", "9", ""],
+    ]
+    df = soat_table_from_grid(grid, 1)
+    assert df.values.tolist() == [
+        ["DEPARTAMENTO", "USO", "MOTOCICLETA", "TOTAL GENERAL"],
+        ["LA PAZ", "SERVICIO PARTICULAR", "7", "9"],
+        ["TOTAL GENERAL", "", "7", "9"],
+    ]
+
+
+def test_without_shift_the_grid_is_unchanged():
+    grid = [["DEPARTAMENTO", "USO", "MOTOCICLETA"], ["ORURO", "SERVICIO PÚBLICO", "3"], ["TOTAL PANDO", "", "3"]]
+    assert soat_table_from_grid(grid, 1).values.tolist() == grid
@@ -0,0 +1,39 @@
+"""
+Memoria acotada en streaming: recorrer un documento largo con
+``iter_long_format`` no debe hacer crecer el RSS con cada página
+(equivale a ``benchmarks/run.py --stream --max-rss-mb``).
+"""
+from pathlib import Path
+
+import pytest
+
+import build_table.asfi
+import build_table.soat
+from benchmarks.run import current_rss_mb
+from benchmarks.synthetic import make_asfi_pdf, make_soat_pdf
+
+# Crecimiento tolerado entre el primer cuarto de páginas (ya "caliente") y el pico
+MAX_GROWTH_MB = 15
+
+pytestmark = pytest.mark.skipif(not Path("/proc/self/statm").exists(), reason="RSS actual solo en Linux")
+
+
+def _rss_per_page(module, pdf_path, pages: int) -> list[float]:
+    rss = []
+    for chunk in module.iter_long_format(pdf_path, range(1, pages + 1)):
+        assert not chunk.empty
+        rss.append(current_rss_mb())
+    assert len(rss) == pages
+    return rss
+
+
+def test_asfi_stream_memory_is_flat(tmp_path):
+    pdf_path = make_asfi_pdf(tmp_path / "2025-04-30_asfi.pdf", pages=24, rows=40, groups=2)
+    rss = _rss_per_page(build_table.asfi, pdf_path, 24)
+    assert max(rss) - rss[len(rss) // 4] < MAX_GROWTH_MB, rss
+
+
+def test_soat_stream_memory_is_flat(tmp_path):
+    pdf_path = make_soat_pdf(tmp_path / "2025-06-30_soat.pdf", pages=24, departments=4, vehicles=6)
+    rss = _rss_per_page(build_table.soat, pdf_path, 24)
+    assert max(rss) - rss[len(rss) // 4] < MAX_GROWTH_MB, rss